@@ -0,0 +1,262 @@
+import asyncio
+from datetime import timedelta
+from typing import List, Dict, Optional
+import aiohttp
+from google.auth.transport.requests import Request
+from quota import QuotaExceededError, DEFAULT_DAILY_BUDGET
+from retry import error_reason, is_retryable_status, parse_retry_after
+from transport import DEFAULT_POOL_SIZE, DEFAULT_TIMEOUT
+from youtube_playlist_collector import (
+    YouTubePlaylistCollector,
+    API_ENDPOINT,
+    PLAYLISTS_KEY_PREFIX,
+    MAX_VIDEO_IDS_PER_REQUEST,
+    VIDEO_MAX_AGE,
+    PLAYLISTS_PART,
+    PLAYLISTS_FIELDS,
+    PLAYLIST_ITEMS_PART,
+    PLAYLIST_ITEMS_FIELDS,
+    VIDEOS_PART,
+    VIDEOS_FIELDS,
+    parse_playlist_item,
+    parse_video
+)
+
+DEFAULT_API_ENDPOINT = 'https://youtube.googleapis.com/'
+
+# Playlists fetched at the same time unless told otherwise
+DEFAULT_MAX_CONCURRENCY = 8
+
+def classify_client_error(error: Exception) -> Optional[float]:
+    """Async counterpart of classify_api_error, for aiohttp errors."""
+    if isinstance(error, aiohttp.ClientResponseError):
+        # _request_once puts the API's error reason in the message
+        if is_retryable_status(error.status, error.message):
+            return parse_retry_after(error.headers.get('Retry-After') if error.headers else None) or 0.0
+        return None
+    if isinstance(error, (asyncio.TimeoutError, aiohttp.ClientConnectionError)):
+        return 0.0
+    return None
+
+class AsyncYouTubePlaylistCollector(YouTubePlaylistCollector):
+    """
+    Asyncio fetch engine for YouTubePlaylistCollector.
+
+    Talks to the YouTube Data API over aiohttp using the credentials loaded
+    by authenticate(), and writes the same rows to the same tables as the
+    synchronous engine. While page N of a listing is being written, the
+    request for page N+1 is already in flight.
+    """
+
+    def __init__(self, max_concurrency: int = DEFAULT_MAX_CONCURRENCY, video_max_age: timedelta = VIDEO_MAX_AGE,
+                 quota_budget: int = DEFAULT_DAILY_BUDGET, pool_size: int = DEFAULT_POOL_SIZE,
+                 timeout: float = DEFAULT_TIMEOUT):
+        """
+        Args:
+            max_concurrency: Maximum number of playlists fetched at the same time
+            video_max_age: Stored videos fetched more recently than this are
+                reused instead of being requested again
+            quota_budget: API quota units that may be spent per day, including
+                units recorded in the database by earlier runs
+            pool_size: Maximum number of open connections
+            timeout: Seconds to wait to connect or for data
+        """
+        super().__init__(video_max_age=video_max_age, quota_budget=quota_budget,
+                         pool_size=pool_size, timeout=timeout)
+        self.max_concurrency = max_concurrency
+        self.api_base_url = (API_ENDPOINT or DEFAULT_API_ENDPOINT).rstrip('/') + '/youtube/v3'
+        self._session = None
+        self._refresh_lock = None
+
+    def sync(self, force: bool = False, max_workers: Optional[int] = None) -> List[Dict]:
+        """
+        Fetch all playlists, their videos and stale videos within the quota budget.
+
+        Args:
+            force: Re-fetch playlists even if they were found unchanged
+            max_workers: Overrides max_concurrency when given
+
+        Returns:
+            List of playlist data dictionaries
+        """
+        if max_workers:
+            self.max_concurrency = max_workers
+        try:
+            return asyncio.run(self._sync(force))
+        finally:
+            self._finish_sync()
+
+    async def _sync(self, force: bool) -> List[Dict]:
+        self._refresh_lock = asyncio.Lock()
+        self._load_resolved_video_ids()
+        playlists = []
+        connector = aiohttp.TCPConnector(limit=self.pool_size)
+        timeout = aiohttp.ClientTimeout(sock_connect=self.timeout, sock_read=self.timeout)
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+            self._session = session
+            try:
+                playlists = await self._get_all_playlists()
+                semaphore = asyncio.Semaphore(self.max_concurrency)
+                # Playlists store their pages as they arrive, so let all of
+                # them settle before raising the first error
+                await self._gather_all(
+                    self._sync_playlist(playlist_id, semaphore)
+                    for playlist_id in self.schedule_playlists(playlists, force)
+                )
+                await self._refresh_stale_videos(semaphore)
+            except QuotaExceededError as e:
+                print(f"Stopping sync: {e}")
+            finally:
+                self._session = None
+        return playlists
+
+    @staticmethod
+    async def _gather_all(coroutines):
+        """Run coroutines concurrently and raise the first error once all have finished."""
+        for result in await asyncio.gather(*coroutines, return_exceptions=True):
+            if isinstance(result, BaseException):
+                raise result
+
+    async def _get_all_playlists(self) -> List[Dict]:
+        """Async counterpart of get_all_playlists."""
+        playlists = []
+
+        async def fetch_page(page_token: Optional[str]):
+            request_key = PLAYLISTS_KEY_PREFIX + (page_token or '')
+            cached_page = self.db.get_page_etag(request_key)
+            response = await self._request('playlists', {
+                'part': PLAYLISTS_PART,
+                'fields': PLAYLISTS_FIELDS,
+                'mine': 'true',
+                'maxResults': 50,
+                'pageToken': page_token
+            }, cached_page)
+            return request_key, cached_page, response
+
+        pending = asyncio.create_task(fetch_page(None))
+        try:
+            while pending:
+                request_key, cached_page, response = await pending
+                next_page_token = cached_page['nextPageToken'] if response is None else response.get('nextPageToken')
+                # Request the next page before writing this one
+                pending = asyncio.create_task(fetch_page(next_page_token)) if next_page_token else None
+
+                if response is None:
+                    # Page not modified since the last run
+                    playlists.extend(self._load_playlists_page(cached_page))
+                else:
+                    playlists.extend(self._store_playlists_page(request_key, response))
+        finally:
+            if pending:
+                pending.cancel()
+
+        return playlists
+
+    async def _sync_playlist(self, playlist_id: str, semaphore: asyncio.Semaphore):
+        """Async counterpart of get_playlist_videos."""
+        async with semaphore:
+            cached_pages = self.db.get_page_etags(self._playlist_items_key(playlist_id, ''))
+
+            async def fetch_page(page_token: Optional[str]):
+                request_key = self._playlist_items_key(playlist_id, page_token)
+                cached_page = cached_pages.get(request_key)
+                response = await self._request('playlistItems', {
+                    'part': PLAYLIST_ITEMS_PART,
+                    'fields': PLAYLIST_ITEMS_FIELDS,
+                    'playlistId': playlist_id,
+                    'maxResults': 50,
+                    'pageToken': page_token
+                }, cached_page)
+                return request_key, cached_page, response
+
+            pending = asyncio.create_task(fetch_page(None))
+            try:
+                while pending:
+                    request_key, cached_page, response = await pending
+                    next_page_token = cached_page['nextPageToken'] if response is None else response.get('nextPageToken')
+                    # Request the next page before resolving and writing this one
+                    pending = asyncio.create_task(fetch_page(next_page_token)) if next_page_token else None
+
+                    if response is None:
+                        # Page not modified since the last run
+                        continue
+
+                    playlist_items = [parse_playlist_item(item, playlist_id) for item in response['items']]
+                    self._store_playlist_page({
+                        'request_key': request_key,
+                        'etag': response['etag'],
+                        'nextPageToken': next_page_token,
+                        'items': playlist_items,
+                        'videos': await self._get_videos(
+                            self._claim_video_ids([item['videoId'] for item in playlist_items]))
+                    })
+            finally:
+                if pending:
+                    pending.cancel()
+            self.pending_playlist_ids.discard(playlist_id)
+
+    async def _refresh_stale_videos(self, semaphore: asyncio.Semaphore):
+        """Async counterpart of refresh_stale_videos."""
+        video_ids = self._claim_stale_video_ids()
+
+        async def refresh(chunk: List[str]):
+            async with semaphore:
+                self._store_videos(await self._get_videos(chunk))
+
+        await self._gather_all(
+            refresh(video_ids[start:start + MAX_VIDEO_IDS_PER_REQUEST])
+            for start in range(0, len(video_ids), MAX_VIDEO_IDS_PER_REQUEST)
+        )
+
+    async def _get_videos(self, video_ids: List[str]) -> List[Dict]:
+        """Async counterpart of get_videos."""
+        video_ids = list(dict.fromkeys(video_ids))
+        responses = await asyncio.gather(*(
+            self._request('videos', {
+                'part': VIDEOS_PART,
+                'fields': VIDEOS_FIELDS,
+                'id': ','.join(video_ids[start:start + MAX_VIDEO_IDS_PER_REQUEST])
+            })
+            for start in range(0, len(video_ids), MAX_VIDEO_IDS_PER_REQUEST)
+        ))
+        return [parse_video(video_item) for response in responses for video_item in response['items']]
+
+    async def _request(self, endpoint: str, params: Dict, cached_page: Optional[Dict] = None) -> Optional[Dict]:
+        """
+        Issue a GET request against an API endpoint, retrying transient failures.
+
+        Returns:
+            The decoded response, or None if the server answered 304 Not Modified
+
+        Raises:
+            QuotaExceededError: If an attempt would exceed the quota budget
+        """
+        params = {key: value for key, value in params.items() if value is not None}
+        return await self.retrier.call_async(
+            lambda: self._request_once(endpoint, params, cached_page), classify_client_error)
+
+    async def _request_once(self, endpoint: str, params: Dict, cached_page: Optional[Dict]) -> Optional[Dict]:
+        """Charge and send a single attempt of a request."""
+        self.quota.charge(f'youtube.{endpoint}.list')
+        await self._ensure_valid_credentials()
+        headers = {'Authorization': f'Bearer {self.credentials.token}'}
+        if cached_page:
+            headers['If-None-Match'] = cached_page['etag']
+
+        async with self._session.get(f'{self.api_base_url}/{endpoint}', params=params, headers=headers) as response:
+            if cached_page and response.status == 304:
+                return None
+            if response.status >= 400:
+                raise aiohttp.ClientResponseError(
+                    response.request_info, response.history, status=response.status,
+                    message=error_reason(await response.read()) or response.reason or '',
+                    headers=response.headers)
+            return await response.json()
+
+    async def _ensure_valid_credentials(self):
+        """Refresh the OAuth access token once when it expires."""
+        if self.credentials.valid:
+            return
+        async with self._refresh_lock:
+            if not self.credentials.valid:
+                await asyncio.to_thread(self.credentials.refresh, Request())
@@ -0,0 +1,73 @@
+"""
+Compare HTTP round trips of a full sync with and without batch requests.
+
+Runs the fake YouTube Data API in-process and syncs a fresh database once
+per mode, reporting API calls, HTTP round trips and wall time:
+
+    python benchmarks/benchmark_batch_requests.py --playlists 100 --latency 0.05
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from http.server import ThreadingHTTPServer
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARKS_DIR))
+sys.path.insert(0, BENCHMARKS_DIR)
+
+from fake_youtube_api import FakeYouTubeData, FakeYouTubeHandler
+
+def start_fake_api(args) -> ThreadingHTTPServer:
+    FakeYouTubeHandler.data = FakeYouTubeData(args.playlists, args.items, args.overlap)
+    FakeYouTubeHandler.latency = args.latency
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FakeYouTubeHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def run_sync(mode: str, workers: int):
+    # Imported late, so the collector picks up YOUTUBE_API_ENDPOINT
+    from google.oauth2.credentials import Credentials
+    from database import YouTubeDatabase, PERFORMANCE_PRAGMAS
+    from youtube_playlist_collector import YouTubePlaylistCollector
+
+    class BenchmarkCollector(YouTubePlaylistCollector):
+        def authenticate(self):
+            self.credentials = Credentials('benchmark')
+            self.youtube = self.build_service()
+
+    FakeYouTubeHandler.request_count = 0
+    FakeYouTubeHandler.round_trip_count = 0
+    with tempfile.TemporaryDirectory() as directory:
+        db = YouTubeDatabase(os.path.join(directory, 'benchmark.db'), PERFORMANCE_PRAGMAS)
+        collector = BenchmarkCollector(db=db, batch=(mode == 'batch'))
+        start = time.perf_counter()
+        collector.sync(max_workers=workers if mode == 'concurrent' else 1)
+        elapsed = time.perf_counter() - start
+        db.close()
+
+    print(f"{mode:<12} {FakeYouTubeHandler.request_count:>9} {FakeYouTubeHandler.round_trip_count:>11} "
+          f"{elapsed:>8.2f}s")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--playlists', type=int, default=100)
+    parser.add_argument('--items', type=int, default=150, help="items per playlist")
+    parser.add_argument('--overlap', type=float, default=0.3,
+                        help="fraction of videos shared with the next playlist")
+    parser.add_argument('--latency', type=float, default=0.05, help="seconds added to every round trip")
+    parser.add_argument('--workers', type=int, default=8, help="workers of the concurrent mode")
+    args = parser.parse_args()
+
+    server = start_fake_api(args)
+    os.environ['YOUTUBE_API_ENDPOINT'] = f'http://127.0.0.1:{server.server_address[1]}/'
+
+    print(f"{'mode':<12} {'API calls':>9} {'round trips':>11} {'time':>9}")
+    for mode in ('serial', 'concurrent', 'batch'):
+        run_sync(mode, args.workers)
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
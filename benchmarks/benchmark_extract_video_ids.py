@@ -0,0 +1,114 @@
+"""
+Compare video ID scanning throughput against earlier scanners.
+
+Generates a synthetic notes/chat corpus where a small fraction of lines carry
+raw or Markdown YouTube links in the watch?v= form, some of them separated by
+a comma, semicolon or pipe instead of whitespace, then reports lines/sec
+for the original line-by-line scanner, a single compiled watch?v= pattern
+and the full URL grammar scanner:
+
+    python benchmarks/benchmark_extract_video_ids.py --lines 2000000
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from file_import_tool import scan_youtube_ids, VIDEO_LINK_MARKER, SCAN_CHUNK_SIZE
+
+# The patterns FileImportTool used before the combined scanner
+LEGACY_PATTERNS = [
+    r'https?://(?:www\.)?youtube\.com/watch\?v=([a-zA-Z0-9_-]+)',
+    r'\[.*?\]\(https?://(?:www\.)?youtube\.com/watch\?v=([a-zA-Z0-9_-]+)\)'
+]
+
+SINGLE_PATTERN = re.compile(r'https?://(?:www\.)?youtube\.com/watch\?v=([a-zA-Z0-9_-]+)')
+
+ID_ALPHABET = 'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_-'
+
+def legacy_scan(file_path):
+    video_ids = set()
+    with open(file_path, 'r', encoding='utf-8') as file:
+        for line in file:
+            for pattern in LEGACY_PATTERNS:
+                video_ids.update(re.findall(pattern, line))
+    return video_ids
+
+def single_pattern_scan(file_path):
+    """Chunked scan like scan_youtube_ids, but with only the watch?v= pattern."""
+    video_ids = set()
+    carry = ''
+    with open(file_path, 'r', encoding='utf-8') as file:
+        while True:
+            block = file.read(SCAN_CHUNK_SIZE)
+            if not block:
+                break
+            text = carry + block
+            cut = text.rfind('\n') + 1
+            text, carry = text[:cut], text[cut:]
+            if VIDEO_LINK_MARKER in text:
+                video_ids.update(SINGLE_PATTERN.findall(text))
+    video_ids.update(SINGLE_PATTERN.findall(carry))
+    return video_ids
+
+def grammar_scan(file_path):
+    return scan_youtube_ids(file_path)[0]
+
+def write_corpus(file_path, lines, link_ratio, seed=0):
+    rng = random.Random(seed)
+    words = ['meeting', 'notes', 'todo', 'review', 'the', 'and', 'deploy', 'check', 'https://example.com/page']
+    with open(file_path, 'w', encoding='utf-8') as file:
+        for _ in range(lines):
+            text = ' '.join(rng.choice(words) for _ in range(12))
+            if rng.random() < link_ratio:
+                video_id = ''.join(rng.choice(ID_ALPHABET) for _ in range(11))
+                url = f'https://www.youtube.com/watch?v={video_id}'
+                if rng.random() < 0.2:
+                    # CSV cells or table columns: links separated without whitespace
+                    video_id = ''.join(rng.choice(ID_ALPHABET) for _ in range(11))
+                    url += rng.choice(',;|') + f'https://www.youtube.com/watch?v={video_id}'
+                text += f' [watch this]({url})' if rng.random() < 0.5 else f' {url}'
+            file.write(text + '\n')
+
+def measure(scan, file_path, lines, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        video_ids = scan(file_path)
+        best = min(best, time.perf_counter() - start)
+    return video_ids, lines / best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--lines', type=int, default=1000000)
+    parser.add_argument('--link-ratio', type=float, default=0.02, help="fraction of lines containing a link")
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        file_path = os.path.join(directory, 'corpus.md')
+        write_corpus(file_path, args.lines, args.link_ratio)
+        size_mb = os.path.getsize(file_path) / (1 << 20)
+        print(f"Corpus: {args.lines} lines, {size_mb:.1f} MB, link ratio {args.link_ratio}")
+
+        legacy_ids, legacy_rate = measure(legacy_scan, file_path, args.lines, args.repeat)
+        print(f"legacy          {legacy_rate:>14,.0f} lines/sec  ({len(legacy_ids)} IDs)")
+
+        single_ids, single_rate = measure(single_pattern_scan, file_path, args.lines, args.repeat)
+        print(f"single pattern  {single_rate:>14,.0f} lines/sec  ({len(single_ids)} IDs)  "
+              f"{single_rate / legacy_rate:.1f}x legacy")
+
+        ids, rate = measure(grammar_scan, file_path, args.lines, args.repeat)
+        print(f"full grammar    {rate:>14,.0f} lines/sec  ({len(ids)} IDs)  "
+              f"{rate / legacy_rate:.1f}x legacy, {rate / single_rate:.0%} of single pattern")
+
+        if not (ids == single_ids == legacy_ids):
+            print("WARNING: scanners found different IDs")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Measure collector startup cost: imports, database setup and service build.
+
+Building the service is timed with the bundled static discovery document
+the collector uses, and optionally with a discovery document fetched over
+the network for comparison:
+
+    python benchmarks/benchmark_startup.py --network
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def timed(label, function, repeat=1):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - start)
+    print(f"{label:<32} {best * 1000:8.1f} ms")
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--network', action='store_true',
+                        help="also time building from a discovery document fetched over the network")
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    timed("import youtube_playlist_collector", lambda: __import__('youtube_playlist_collector'))
+
+    from googleapiclient.discovery import build
+    from google.oauth2.credentials import Credentials
+    from database import YouTubeDatabase, PERFORMANCE_PRAGMAS
+    from youtube_playlist_collector import YouTubePlaylistCollector
+
+    with tempfile.TemporaryDirectory() as directory:
+        db_path = os.path.join(directory, 'startup.db')
+        timed("YouTubeDatabase()", lambda: YouTubeDatabase(db_path, PERFORMANCE_PRAGMAS).close(), args.repeat)
+
+    # A collector without authenticate(), to time build_service() alone
+    collector = YouTubePlaylistCollector.__new__(YouTubePlaylistCollector)
+    collector.API_SERVICE_NAME = 'youtube'
+    collector.API_VERSION = 'v3'
+    collector.credentials = Credentials('benchmark')
+    collector.http = None
+    timed("build_service() static discovery", collector.build_service, args.repeat)
+
+    if args.network:
+        try:
+            timed("build() network discovery",
+                  lambda: build('youtube', 'v3', credentials=collector.credentials,
+                                static_discovery=False, cache_discovery=False),
+                  args.repeat)
+        except Exception as e:
+            print(f"build() network discovery        failed: {e}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+"""
+Local fake of the YouTube Data API endpoints used by the collectors.
+
+Serves deterministic playlists, playlistItems and videos listings with
+etags and 304 handling, batch requests, plus an optional per-request
+latency and rate of transient errors, so the sync and async engines can be
+benchmarked against each other offline:
+
+    python benchmarks/fake_youtube_api.py --port 8765 --latency 0.05
+    YOUTUBE_API_ENDPOINT=http://127.0.0.1:8765/ python youtube_playlist_collector.py
+    YOUTUBE_API_ENDPOINT=http://127.0.0.1:8765/ python youtube_playlist_collector.py --engine async --workers 8
+"""
+import argparse
+import hashlib
+import json
+import random
+import time
+import uuid
+from email.parser import BytesParser, Parser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+PAGE_SIZE = 50
+
+# Batch endpoint path: rootUrl + batchPath from the API's discovery document
+BATCH_PATH = '/batch'
+
+# Transient errors served with --error-rate: (status, error reason, Retry-After)
+TRANSIENT_ERRORS = [
+    (503, 'backendError', '1'),
+    (500, 'backendError', None),
+    (403, 'rateLimitExceeded', None),
+    (429, 'rateLimitExceeded', '1')
+]
+
+class FakeYouTubeData:
+    """Deterministic account with playlists whose videos partly overlap."""
+
+    def __init__(self, playlists: int, items_per_playlist: int, overlap: float):
+        self.playlists = playlists
+        self.items_per_playlist = items_per_playlist
+        # Consecutive playlists share this many videos
+        self.shared = int(items_per_playlist * overlap)
+
+    def video_id(self, playlist_index: int, position: int) -> str:
+        number = playlist_index * (self.items_per_playlist - self.shared) + position
+        return f'v{number:010d}'
+
+    def playlist(self, index: int) -> Dict:
+        return {
+            'kind': 'youtube#playlist',
+            'id': f'PL{index:08d}',
+            'snippet': {
+                'publishedAt': '2020-01-01T00:00:00Z',
+                'channelId': 'UCfake',
+                'title': f'Playlist {index}',
+                'description': f'Fake playlist number {index}'
+            },
+            'contentDetails': {'itemCount': self.items_per_playlist}
+        }
+
+    def playlist_item(self, playlist_index: int, position: int) -> Dict:
+        return {
+            'kind': 'youtube#playlistItem',
+            'id': f'PLI{playlist_index:08d}{position:06d}',
+            'snippet': {'position': position},
+            'contentDetails': {'videoId': self.video_id(playlist_index, position)}
+        }
+
+    def video(self, video_id: str) -> Dict:
+        return {
+            'kind': 'youtube#video',
+            'id': video_id,
+            'snippet': {
+                'publishedAt': '2020-01-01T00:00:00Z',
+                'channelId': 'UCfake',
+                'channelTitle': 'Fake Channel',
+                'title': f'Video {video_id}',
+                'description': 'x' * 200
+            }
+        }
+
+    def page(self, resources: List[Dict], page_token: str) -> Dict:
+        start = int(page_token or 0)
+        response = {'items': resources[start:start + PAGE_SIZE]}
+        if start + PAGE_SIZE < len(resources):
+            response['nextPageToken'] = str(start + PAGE_SIZE)
+        return response
+
+    def respond(self, endpoint: str, query: Dict[str, str]) -> Dict:
+        if endpoint == 'playlists':
+            resources = [self.playlist(index) for index in range(self.playlists)]
+            return self.page(resources, query.get('pageToken'))
+        if endpoint == 'playlistItems':
+            playlist_index = int(query['playlistId'][2:])
+            resources = [self.playlist_item(playlist_index, position)
+                         for position in range(self.items_per_playlist)]
+            return self.page(resources, query.get('pageToken'))
+        if endpoint == 'videos':
+            return {'items': [self.video(video_id) for video_id in query['id'].split(',')]}
+        raise KeyError(endpoint)
+
+def with_etags(response: Dict) -> Dict:
+    """Add content-derived etags to a response and its items."""
+    for item in response['items']:
+        item['etag'] = etag_of(item)
+    response['etag'] = etag_of(response)
+    return response
+
+def etag_of(value: Dict) -> str:
+    return hashlib.sha1(json.dumps(value, sort_keys=True).encode('utf-8')).hexdigest()
+
+class FakeYouTubeHandler(BaseHTTPRequestHandler):
+    # Keep connections alive, as the real API does, without Nagle delays
+    # between the separately written headers and body
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    data = None
+    latency = 0.0
+    error_rate = 0.0
+    round_trip_count = 0
+    request_count = 0
+    error_count = 0
+    connection_count = 0
+
+    def setup(self):
+        super().setup()
+        type(self).connection_count += 1
+
+    def do_GET(self):
+        time.sleep(self.latency)
+        type(self).round_trip_count += 1
+        status, headers, body = self.api_response(self.path, self.headers.get('If-None-Match'))
+        self.send_response(status)
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        """Answer a batch request: one multipart/mixed part per API call."""
+        request_body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if urlparse(self.path).path.rstrip('/') != BATCH_PATH:
+            self.send_error(404)
+            return
+        time.sleep(self.latency)
+        type(self).round_trip_count += 1
+
+        message = BytesParser().parsebytes(
+            b'Content-Type: ' + self.headers['Content-Type'].encode('ascii') + b'\r\n\r\n' + request_body)
+        boundary = uuid.uuid4().hex
+        body = b''
+        for part in message.get_payload():
+            request_line, request_headers = part.get_payload().split('\n', 1)
+            path = request_line.split(' ')[1]
+            if_none_match = Parser().parsestr(request_headers, headersonly=True).get('If-None-Match')
+            status, headers, part_body = self.api_response(path, if_none_match)
+            body += (
+                f'--{boundary}\r\n'
+                f'Content-Type: application/http\r\n'
+                f'Content-ID: <response-{part["Content-ID"][1:]}\r\n\r\n'
+                f'HTTP/1.1 {status} {self.responses[status][0]}\r\n'
+                + ''.join(f'{key}: {value}\r\n' for key, value in headers.items())
+                + '\r\n'
+            ).encode('utf-8') + part_body + b'\r\n'
+        body += f'--{boundary}--\r\n'.encode('ascii')
+
+        self.send_response(200)
+        self.send_header('Content-Type', f'multipart/mixed; boundary={boundary}')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def api_response(self, path: str, if_none_match: Optional[str]) -> Tuple[int, Dict[str, str], bytes]:
+        """Answer a single API call with its status, headers and body."""
+        url = urlparse(path)
+        endpoint = url.path.rstrip('/').rsplit('/', 1)[-1]
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        type(self).request_count += 1
+
+        if random.random() < self.error_rate:
+            type(self).error_count += 1
+            status, reason, retry_after = random.choice(TRANSIENT_ERRORS)
+            headers = {'Content-Type': 'application/json; charset=UTF-8'}
+            if retry_after:
+                headers['Retry-After'] = retry_after
+            return status, headers, json.dumps({'error': {
+                'code': status,
+                'message': reason,
+                'errors': [{'reason': reason, 'domain': 'youtube.quota'}]
+            }}).encode('utf-8')
+
+        try:
+            response = with_etags(self.data.respond(endpoint, query))
+        except KeyError:
+            return 404, {'Content-Type': 'application/json; charset=UTF-8'}, json.dumps({'error': {
+                'code': 404,
+                'message': 'Not Found',
+                'errors': [{'reason': 'notFound'}]
+            }}).encode('utf-8')
+
+        if if_none_match == response['etag']:
+            return 304, {'ETag': response['etag']}, b''
+        return 200, {
+            'Content-Type': 'application/json; charset=UTF-8',
+            'ETag': response['etag']
+        }, json.dumps(response).encode('utf-8')
+
+    def log_message(self, format, *args):
+        pass
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local fake YouTube Data API server.")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--playlists', type=int, default=400)
+    parser.add_argument('--items', type=int, default=150, help="items per playlist")
+    parser.add_argument('--overlap', type=float, default=0.3,
+                        help="fraction of videos shared with the next playlist")
+    parser.add_argument('--latency', type=float, default=0.05, help="seconds added to every request")
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help="fraction of requests answered with a transient error (default: 0)")
+    args = parser.parse_args()
+
+    FakeYouTubeHandler.data = FakeYouTubeData(args.playlists, args.items, args.overlap)
+    FakeYouTubeHandler.latency = args.latency
+    FakeYouTubeHandler.error_rate = args.error_rate
+    server = ThreadingHTTPServer(('127.0.0.1', args.port), FakeYouTubeHandler)
+    print(f"Fake YouTube API listening on http://127.0.0.1:{args.port}/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f"Served {FakeYouTubeHandler.request_count} API calls in "
+              f"{FakeYouTubeHandler.round_trip_count} round trips over "
+              f"{FakeYouTubeHandler.connection_count} connections, "
+              f"{FakeYouTubeHandler.error_count} of them transient errors")
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -1,26 +1,117 @@
 import sqlite3
+from contextlib import contextmanager
 from datetime import datetime
-from typing import Dict, List
+from itertools import islice
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
 import json
 
+PLAYLIST_COLUMNS = ('etag', 'id', 'publishedAt', 'channelId', 'title', 'description', 'itemCount')
+PLAYLIST_ITEM_COLUMNS = ('etag', 'id', 'playlistId', 'videoId', 'position')
+VIDEO_COLUMNS = ('etag', 'id', 'title', 'description', 'publishedAt', 'channelId', 'channelTitle', 'fetchedAt')
+
+# Rows per executemany batch; also keeps IN (...) lists under SQLite's variable limit
+BULK_CHUNK_SIZE = 500
+
+# Pragma profile for sync jobs: WAL lets readers run while a sync is writing,
+# and synchronous=NORMAL fsyncs only at WAL checkpoints instead of every commit
+PERFORMANCE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'cache_size': -64000,  # negative values are KiB, so ~64 MB
+    'mmap_size': 268435456,
+    'temp_store': 'MEMORY'
+}
+
 class YouTubeDatabase:
-    def __init__(self, db_path: str = "youtube_data.db"):
+    def __init__(self, db_path: str = "youtube_data.db", pragmas: Optional[Dict] = None):
+        """
+        Args:
+            db_path: Path to the SQLite database file
+            pragmas: SQLite pragmas applied on connect, e.g. PERFORMANCE_PRAGMAS;
+                SQLite defaults are used when omitted
+        """
         self.db_path = db_path
+        self.pragmas = pragmas or {}
         self.conn = None
         self.cursor = None
+        self._transaction_depth = 0
+        self._rollback_callbacks = []
         self.initialize_database()
 
+    def __enter__(self):
+        self.connect()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
     def connect(self):
-        """Establish connection to the SQLite database."""
-        self.conn = sqlite3.connect(self.db_path)
-        self.cursor = self.conn.cursor()
+        """Establish connection to the SQLite database if not already open."""
+        if self.conn is None:
+            self.conn = sqlite3.connect(self.db_path)
+            self.cursor = self.conn.cursor()
+            self._apply_pragmas()
+
+    def _apply_pragmas(self):
+        """Apply the configured pragmas to the open connection."""
+        for name, value in self.pragmas.items():
+            if not name.isidentifier() or not (isinstance(value, int) or str(value).isalnum()):
+                raise ValueError(f"Invalid pragma: {name}={value!r}")
+            self.cursor.execute(f'PRAGMA {name} = {value}')
+            self.cursor.fetchall()
 
     def close(self):
-        """Close the database connection."""
+        """Commit pending changes and close the database connection."""
         if self.conn:
+            self.conn.commit()
             self.conn.close()
             self.conn = None
             self.cursor = None
+            self._transaction_depth = 0
+            self._rollback_callbacks = []
+
+    @contextmanager
+    def transaction(self):
+        """
+        Group writes into a single commit.
+
+        Transactions may be nested; only the outermost one commits, and an
+        exception escaping it rolls back everything written since it began,
+        then runs the callbacks registered with on_rollback.
+        """
+        self.connect()
+        self._transaction_depth += 1
+        try:
+            yield self
+        except BaseException:
+            self._transaction_depth -= 1
+            if self._transaction_depth == 0:
+                self.conn.rollback()
+                callbacks, self._rollback_callbacks = self._rollback_callbacks, []
+                for callback in callbacks:
+                    callback()
+            raise
+        else:
+            self._transaction_depth -= 1
+            if self._transaction_depth == 0:
+                self.conn.commit()
+                self._rollback_callbacks = []
+
+    def on_rollback(self, callback: Callable[[], None]):
+        """
+        Run callback after the open transaction is rolled back.
+
+        Lets writes that must survive a rollback, such as quota charges for
+        requests already sent, be redone once it happened. Does nothing
+        outside a transaction, where every write is committed right away.
+        """
+        if self._transaction_depth > 0:
+            self._rollback_callbacks.append(callback)
+
+    def _commit(self):
+        """Commit the current statement unless a transaction is open."""
+        if self._transaction_depth == 0:
+            self.conn.commit()
 
     def initialize_database(self):
         """Create the database tables if they don't exist."""
@@ -60,101 +151,398 @@ class YouTubeDatabase:
             description TEXT,
             publishedAt DATETIME,
             channelId TEXT,
-            channelTitle TEXT
+            channelTitle TEXT,
+            fetchedAt DATETIME
+        )
+        ''')
+
+        # Add fetchedAt to video tables created before it was tracked
+        self.cursor.execute('PRAGMA table_info(video)')
+        if 'fetchedAt' not in {column[1] for column in self.cursor.fetchall()}:
+            self.cursor.execute('ALTER TABLE video ADD COLUMN fetchedAt DATETIME')
+
+        # Create page_etag table for conditional requests on paged list endpoints
+        self.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS page_etag (
+            requestKey TEXT PRIMARY KEY,
+            etag TEXT,
+            nextPageToken TEXT,
+            itemIds TEXT
+        )
+        ''')
+
+        # Create scan_ledger table recording how far each imported file was scanned
+        self.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS scan_ledger (
+            path TEXT PRIMARY KEY,
+            size INTEGER,
+            mtime INTEGER,
+            inode INTEGER,
+            scannedOffset INTEGER,
+            fingerprint TEXT,
+            scannedAt DATETIME
+        )
+        ''')
+
+        # Create quota_ledger table recording API quota units spent per day and method
+        self.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS quota_ledger (
+            day TEXT,
+            method TEXT,
+            units INTEGER,
+            requests INTEGER,
+            PRIMARY KEY (day, method)
         )
         ''')
 
+        # Create indexes for playlist item and channel lookups
+        self.cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_playlist_item_playlist_position
+        ON playlist_item (playlistId, position)
+        ''')
+        self.cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_playlist_item_video
+        ON playlist_item (videoId)
+        ''')
+        self.cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_video_channel
+        ON video (channelId)
+        ''')
+
         self.conn.commit()
-        self.close()
 
     def insert_playlist(self, playlist_data: Dict):
         """Insert or update a playlist record."""
         self.connect()
-        try:
-            self.cursor.execute('''
-            INSERT OR REPLACE INTO playlist 
-            (etag, id, publishedAt, channelId, title, description, itemCount)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                playlist_data.get('etag'),
-                playlist_data.get('id'),
-                playlist_data.get('publishedAt'),
-                playlist_data.get('channelId'),
-                playlist_data.get('title'),
-                playlist_data.get('description'),
-                playlist_data.get('itemCount')
-            ))
-            self.conn.commit()
-        finally:
-            self.close()
+        self.cursor.execute('''
+        INSERT OR REPLACE INTO playlist 
+        (etag, id, publishedAt, channelId, title, description, itemCount)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (
+            playlist_data.get('etag'),
+            playlist_data.get('id'),
+            playlist_data.get('publishedAt'),
+            playlist_data.get('channelId'),
+            playlist_data.get('title'),
+            playlist_data.get('description'),
+            playlist_data.get('itemCount')
+        ))
+        self._commit()
 
     def insert_playlist_item(self, item_data: Dict):
         """Insert or update a playlist item record."""
         self.connect()
-        try:
-            self.cursor.execute('''
-            INSERT OR REPLACE INTO playlist_item 
-            (etag, id, playlistId, videoId, position)
-            VALUES (?, ?, ?, ?, ?)
-            ''', (
-                item_data.get('etag'),
-                item_data.get('id'),
-                item_data.get('playlistId'),
-                item_data.get('videoId'),
-                item_data.get('position')
-            ))
-            self.conn.commit()
-        finally:
-            self.close()
+        self.cursor.execute('''
+        INSERT OR REPLACE INTO playlist_item 
+        (etag, id, playlistId, videoId, position)
+        VALUES (?, ?, ?, ?, ?)
+        ''', (
+            item_data.get('etag'),
+            item_data.get('id'),
+            item_data.get('playlistId'),
+            item_data.get('videoId'),
+            item_data.get('position')
+        ))
+        self._commit()
 
     def insert_video(self, video_data: Dict):
         """Insert or update a video record."""
         self.connect()
-        try:
-            self.cursor.execute('''
-            INSERT OR REPLACE INTO video 
-            (etag, id, title, description, publishedAt, channelId, channelTitle)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                video_data.get('etag'),
-                video_data.get('id'),
-                video_data.get('title'),
-                video_data.get('description'),
-                video_data.get('publishedAt'),
-                video_data.get('channelId'),
-                video_data.get('channelTitle')
-            ))
-            self.conn.commit()
-        finally:
-            self.close()
+        self.cursor.execute('''
+        INSERT OR REPLACE INTO video 
+        (etag, id, title, description, publishedAt, channelId, channelTitle, fetchedAt)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (
+            video_data.get('etag'),
+            video_data.get('id'),
+            video_data.get('title'),
+            video_data.get('description'),
+            video_data.get('publishedAt'),
+            video_data.get('channelId'),
+            video_data.get('channelTitle'),
+            video_data.get('fetchedAt')
+        ))
+        self._commit()
+
+    def insert_playlists(self, playlists: Iterable[Dict]) -> Dict[str, int]:
+        """Insert or update many playlist records in one transaction."""
+        return self._upsert_many('playlist', PLAYLIST_COLUMNS, playlists)
+
+    def insert_playlist_items(self, items: Iterable[Dict]) -> Dict[str, int]:
+        """Insert or update many playlist item records in one transaction."""
+        return self._upsert_many('playlist_item', PLAYLIST_ITEM_COLUMNS, items)
+
+    def insert_videos(self, videos: Iterable[Dict]) -> Dict[str, int]:
+        """Insert or update many video records in one transaction."""
+        return self._upsert_many('video', VIDEO_COLUMNS, videos)
+
+    def get_existing_video_ids(self, video_ids: Iterable[str]) -> Set[str]:
+        """Return the subset of video_ids already stored, using chunked IN (...) queries."""
+        self.connect()
+        return self._existing_ids('video', list(video_ids))
+
+    def get_recently_fetched_video_ids(self, since: datetime) -> Set[str]:
+        """Return the IDs of videos fetched from the API at or after since."""
+        self.connect()
+        self.cursor.execute('SELECT id FROM video WHERE fetchedAt >= ?', (since,))
+        return {row[0] for row in self.cursor.fetchall()}
+
+    def get_stale_video_ids(self, fetched_before: datetime, limit: int) -> List[str]:
+        """Return up to limit IDs of videos fetched before fetched_before, oldest first."""
+        self.connect()
+        self.cursor.execute('''
+        SELECT id FROM video
+        WHERE fetchedAt IS NULL OR fetchedAt < ?
+        ORDER BY fetchedAt IS NOT NULL, fetchedAt
+        LIMIT ?
+        ''', (fetched_before, limit))
+        return [row[0] for row in self.cursor.fetchall()]
+
+    def _upsert_many(self, table: str, columns: tuple, rows: Iterable[Dict]) -> Dict[str, int]:
+        """
+        Insert or replace rows with executemany, BULK_CHUNK_SIZE rows at a time.
+
+        Args:
+            table: Table to write to
+            columns: Column names, in table order
+            rows: Iterable of record dictionaries; generators are consumed lazily
+
+        Returns:
+            Dictionary with the number of 'inserted' and 'updated' rows
+        """
+        sql = 'INSERT OR REPLACE INTO {} ({}) VALUES ({})'.format(
+            table, ', '.join(columns), ', '.join('?' * len(columns)))
+        counts = {'inserted': 0, 'updated': 0}
+        rows = iter(rows)
+
+        with self.transaction():
+            while True:
+                chunk = list(islice(rows, BULK_CHUNK_SIZE))
+                if not chunk:
+                    break
+
+                seen = self._existing_ids(table, [row.get('id') for row in chunk])
+                for row in chunk:
+                    if row.get('id') in seen:
+                        counts['updated'] += 1
+                    else:
+                        counts['inserted'] += 1
+                        seen.add(row.get('id'))
+
+                self.cursor.executemany(sql, [tuple(row.get(column) for column in columns) for row in chunk])
+
+        return counts
+
+    def _existing_ids(self, table: str, ids: List[str]) -> Set[str]:
+        """Return the subset of ids already present in a table."""
+        existing = set()
+        for start in range(0, len(ids), BULK_CHUNK_SIZE):
+            chunk = ids[start:start + BULK_CHUNK_SIZE]
+            self.cursor.execute(
+                'SELECT id FROM {} WHERE id IN ({})'.format(table, ', '.join('?' * len(chunk))),
+                chunk)
+            existing.update(row[0] for row in self.cursor.fetchall())
+        return existing
 
     def get_all_playlists(self) -> List[Dict]:
         """Retrieve all playlists from the database."""
         self.connect()
-        try:
-            self.cursor.execute('SELECT * FROM playlist')
+        self.cursor.execute('SELECT * FROM playlist')
+        columns = [description[0] for description in self.cursor.description]
+        return [dict(zip(columns, row)) for row in self.cursor.fetchall()]
+
+    def get_playlists_by_id(self, playlist_ids: List[str]) -> List[Dict]:
+        """Retrieve the given playlists, in the order of playlist_ids."""
+        self.connect()
+        playlists = {}
+        for start in range(0, len(playlist_ids), BULK_CHUNK_SIZE):
+            chunk = playlist_ids[start:start + BULK_CHUNK_SIZE]
+            self.cursor.execute(
+                'SELECT * FROM playlist WHERE id IN ({})'.format(', '.join('?' * len(chunk))),
+                chunk)
             columns = [description[0] for description in self.cursor.description]
-            return [dict(zip(columns, row)) for row in self.cursor.fetchall()]
-        finally:
-            self.close()
+            for row in self.cursor.fetchall():
+                playlist = dict(zip(columns, row))
+                playlists[playlist['id']] = playlist
+        return [playlists[playlist_id] for playlist_id in playlist_ids if playlist_id in playlists]
 
-    def get_playlist_items(self, playlist_id: str) -> List[Dict]:
-        """Retrieve all items for a specific playlist."""
+    def get_playlist_sync_state(self, playlist_ids: List[str]) -> Dict[str, Dict]:
+        """
+        Retrieve the stored etag, itemCount and number of stored items per playlist.
+
+        Args:
+            playlist_ids: IDs of the playlists to look up
+
+        Returns:
+            Dictionary mapping playlist ID to a dictionary with 'etag',
+            'itemCount' and 'storedItemCount'; unknown playlists are omitted
+        """
+        self.connect()
+        state = {}
+        for start in range(0, len(playlist_ids), BULK_CHUNK_SIZE):
+            chunk = playlist_ids[start:start + BULK_CHUNK_SIZE]
+            self.cursor.execute('''
+            SELECT p.id, p.etag, p.itemCount,
+                (SELECT COUNT(*) FROM playlist_item pi WHERE pi.playlistId = p.id)
+            FROM playlist p
+            WHERE p.id IN ({})
+            '''.format(', '.join('?' * len(chunk))), chunk)
+            for playlist_id, etag, item_count, stored_item_count in self.cursor.fetchall():
+                state[playlist_id] = {
+                    'etag': etag,
+                    'itemCount': item_count,
+                    'storedItemCount': stored_item_count
+                }
+        return state
+
+    def clear_playlist_etags(self, playlist_ids: List[str]):
+        """Clear the stored etag of playlists, so they no longer match the API's."""
         self.connect()
+        with self.transaction():
+            for start in range(0, len(playlist_ids), BULK_CHUNK_SIZE):
+                chunk = playlist_ids[start:start + BULK_CHUNK_SIZE]
+                self.cursor.execute(
+                    'UPDATE playlist SET etag = NULL WHERE id IN ({})'.format(', '.join('?' * len(chunk))),
+                    chunk)
+
+    def get_page_etag(self, request_key: str) -> Optional[Dict]:
+        """Retrieve the stored etag, next page token and item IDs of a list page."""
+        self.connect()
+        self.cursor.execute(
+            'SELECT etag, nextPageToken, itemIds FROM page_etag WHERE requestKey = ?',
+            (request_key,))
+        row = self.cursor.fetchone()
+        if not row:
+            return None
+        return {'etag': row[0], 'nextPageToken': row[1], 'itemIds': json.loads(row[2])}
+
+    def get_page_etags(self, key_prefix: str) -> Dict[str, Dict]:
+        """Retrieve all stored list pages whose request key starts with key_prefix."""
+        self.connect()
+        self.cursor.execute(
+            'SELECT requestKey, etag, nextPageToken, itemIds FROM page_etag WHERE substr(requestKey, 1, ?) = ?',
+            (len(key_prefix), key_prefix))
+        return {
+            row[0]: {'etag': row[1], 'nextPageToken': row[2], 'itemIds': json.loads(row[3])}
+            for row in self.cursor.fetchall()
+        }
+
+    def set_page_etag(self, request_key: str, etag: str, next_page_token: Optional[str], item_ids: List[str]):
+        """Insert or update the etag, next page token and item IDs of a list page."""
+        self.connect()
+        self.cursor.execute('''
+        INSERT OR REPLACE INTO page_etag
+        (requestKey, etag, nextPageToken, itemIds)
+        VALUES (?, ?, ?, ?)
+        ''', (request_key, etag, next_page_token, json.dumps(item_ids)))
+        self._commit()
+
+    def delete_page_etags(self, key_prefix: str):
+        """Delete all stored list pages whose request key starts with key_prefix."""
+        self.connect()
+        self.cursor.execute('DELETE FROM page_etag WHERE substr(requestKey, 1, ?) = ?',
+                            (len(key_prefix), key_prefix))
+        self._commit()
+
+    def get_scan_ledger(self) -> Dict[str, Dict]:
+        """Retrieve all scan ledger entries keyed by file path."""
+        self.connect()
+        self.cursor.execute('SELECT * FROM scan_ledger')
+        columns = [description[0] for description in self.cursor.description]
+        return {row[0]: dict(zip(columns, row)) for row in self.cursor.fetchall()}
+
+    def update_scan_ledger(self, entries: Iterable[Dict]):
+        """Insert or update scan ledger entries in one transaction."""
+        with self.transaction():
+            self.cursor.executemany('''
+            INSERT OR REPLACE INTO scan_ledger
+            (path, size, mtime, inode, scannedOffset, fingerprint, scannedAt)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', [(
+                entry.get('path'),
+                entry.get('size'),
+                entry.get('mtime'),
+                entry.get('inode'),
+                entry.get('scannedOffset'),
+                entry.get('fingerprint'),
+                entry.get('scannedAt')
+            ) for entry in entries])
+
+    def get_quota_usage(self, day: str) -> int:
+        """Return the quota units recorded for a quota day."""
+        self.connect()
+        self.cursor.execute('SELECT COALESCE(SUM(units), 0) FROM quota_ledger WHERE day = ?', (day,))
+        return self.cursor.fetchone()[0]
+
+    def add_quota_usage(self, usage: Dict[Tuple[str, str], Tuple[int, int]]):
+        """
+        Add quota units and request counts to the quota ledger.
+
+        Args:
+            usage: Dictionary mapping (day, method) to (units, requests)
+        """
+        self.connect()
+        self.cursor.executemany('''
+        INSERT INTO quota_ledger (day, method, units, requests) VALUES (?, ?, ?, ?)
+        ON CONFLICT (day, method) DO UPDATE SET
+            units = units + excluded.units,
+            requests = requests + excluded.requests
+        ''', [(day, method, units, requests) for (day, method), (units, requests) in usage.items()])
+        self._commit()
+
+    def count_playlists(self) -> int:
+        """Return the number of playlists in the database."""
+        self.connect()
+        self.cursor.execute('SELECT COUNT(*) FROM playlist')
+        return self.cursor.fetchone()[0]
+
+    def iter_playlist_report(self) -> Iterator[Dict]:
+        """
+        Stream every playlist joined with its items and their videos in one query.
+
+        Rows are ordered by playlist, then by item position. Playlists without
+        items yield a single row whose item and video fields are None, and items
+        whose video is not stored yield None video fields.
+
+        Yields:
+            Dictionary per playlist item with playlist, item and video fields
+        """
+        self.connect()
+        # Use a dedicated cursor so other queries can run while this one is consumed
+        cursor = self.conn.cursor()
         try:
-            self.cursor.execute('SELECT * FROM playlist_item WHERE playlistId = ?', (playlist_id,))
-            columns = [description[0] for description in self.cursor.description]
-            return [dict(zip(columns, row)) for row in self.cursor.fetchall()]
+            cursor.execute('''
+            SELECT
+                p.id AS playlistId,
+                p.title AS playlistTitle,
+                p.description AS playlistDescription,
+                p.itemCount AS itemCount,
+                pi.position AS position,
+                v.id AS videoId,
+                v.title AS videoTitle,
+                v.channelTitle AS channelTitle
+            FROM playlist p
+            LEFT JOIN playlist_item pi ON pi.playlistId = p.id
+            LEFT JOIN video v ON v.id = pi.videoId
+            ORDER BY p.rowid, pi.position
+            ''')
+            columns = [description[0] for description in cursor.description]
+            for row in cursor:
+                yield dict(zip(columns, row))
         finally:
-            self.close()
+            cursor.close()
+
+    def get_playlist_items(self, playlist_id: str) -> List[Dict]:
+        """Retrieve all items for a specific playlist, ordered by position."""
+        self.connect()
+        self.cursor.execute('SELECT * FROM playlist_item WHERE playlistId = ? ORDER BY position', (playlist_id,))
+        columns = [description[0] for description in self.cursor.description]
+        return [dict(zip(columns, row)) for row in self.cursor.fetchall()]
 
     def get_video(self, video_id: str) -> Dict:
         """Retrieve a specific video by ID."""
         self.connect()
-        try:
-            self.cursor.execute('SELECT * FROM video WHERE id = ?', (video_id,))
-            columns = [description[0] for description in self.cursor.description]
-            row = self.cursor.fetchone()
-            return dict(zip(columns, row)) if row else None
-        finally:
-            self.close() 
\ No newline at end of file
+        self.cursor.execute('SELECT * FROM video WHERE id = ?', (video_id,))
+        columns = [description[0] for description in self.cursor.description]
+        row = self.cursor.fetchone()
+        return dict(zip(columns, row)) if row else None
@@ -1,8 +1,320 @@
 import re
 import os
-from typing import List, Set, Dict
-from youtube_playlist_collector import YouTubePlaylistCollector
-from database import YouTubeDatabase
+import glob
+import mmap
+import hashlib
+import queue
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import List, Set, Dict, Iterable, Iterator, Optional, TextIO, Tuple
+from database import YouTubeDatabase, PERFORMANCE_PRAGMAS
+from quota import QuotaExceededError, DEFAULT_DAILY_BUDGET
+
+# Any YouTube link: youtube.com on www., m. or music., or the youtu.be short host.
+# Markdown links such as [Title](https://youtu.be/VIDEO_ID) contain the URL, so a
+# single pass over the text finds every link regardless of format. The pattern
+# starts at the host so the regex engine can skip ahead to the literal 'youtu';
+# the scheme and subdomain before it are checked per match with URL_PREFIX_PATTERN.
+# A URL also ends at , ; or | and where another http(s):// URL starts, so links
+# in CSV rows, Markdown tables or glued together are each matched separately.
+YOUTUBE_URL_PATTERN = re.compile(r'youtu(?:be\.com|\.be)/(?:[^\s<>"\'()\[\],;|h]|h(?!ttps?://))+')
+URL_PREFIX_PATTERN = re.compile(r'https?://(?:(?:www|m|music)\.)?$')
+URL_PREFIX_LENGTH = len('https://music.')
+
+# Video IDs are exactly 11 characters, found after youtu.be/, /shorts/, /embed/,
+# /live/ or /v/, or in a v= query parameter at any position (watch?feature=x&v=ID)
+VIDEO_ID_IN_URL_PATTERN = re.compile(
+    r'(?:youtu\.be/|/(?:shorts|embed|live|v)/|[?&]v=)([A-Za-z0-9_-]{11})(?![A-Za-z0-9_-])'
+)
+PLAYLIST_ID_IN_URL_PATTERN = re.compile(r'[?&]list=([A-Za-z0-9_-]+)')
+
+# Cheap substring test that every link contains; text without it is never regex-scanned
+VIDEO_LINK_MARKER = 'youtu'
+
+# Characters of text decoded per read when scanning a file
+SCAN_CHUNK_SIZE = 1 << 20
+
+# Files at least this large are scanned as raw bytes through mmap instead of
+# being decoded, in windows of MMAP_WINDOW_SIZE bytes. A link starting inside a
+# window may run up to MAX_URL_LENGTH bytes past its end.
+MMAP_SCAN_THRESHOLD = 64 << 20
+MMAP_WINDOW_SIZE = 16 << 20
+MAX_URL_LENGTH = 4096
+
+# Byte range of a large file handed to one worker when scanning in parallel
+PARALLEL_SCAN_CHUNK_SIZE = 64 << 20
+
+# Small files are sent to workers in batches of about this many bytes
+PARALLEL_SCAN_BATCH_SIZE = 8 << 20
+
+# Streaming input: new video IDs are resolved and stored once this many are
+# pending (one videos request) or the oldest has waited STREAM_FLUSH_INTERVAL
+# seconds, and the last STREAM_DEDUP_WINDOW IDs seen are not looked up again
+STREAM_BATCH_SIZE = 50
+STREAM_FLUSH_INTERVAL = 2.0
+STREAM_DEDUP_WINDOW = 100000
+
+# File extensions picked up when walking directories and globs
+DEFAULT_EXTENSIONS = ('.txt', '.md', '.markdown', '.log', '.json', '.csv', '.html', '.htm')
+
+# Bytes just before the previously scanned offset that are hashed to tell an
+# appended file from a rewritten one
+LEDGER_FINGERPRINT_SIZE = 4096
+
+YOUTUBE_URL_BYTES_PATTERN = re.compile(YOUTUBE_URL_PATTERN.pattern.encode('ascii'))
+URL_PREFIX_BYTES_PATTERN = re.compile(URL_PREFIX_PATTERN.pattern.encode('ascii'))
+VIDEO_LINK_MARKER_BYTES = VIDEO_LINK_MARKER.encode('ascii')
+
+def find_youtube_ids(text: str, video_ids: Set[str], playlist_ids: Set[str]):
+    """
+    Add the video and playlist IDs linked in text to the given sets.
+
+    The text is scanned once for YouTube URLs; only the (rare) matched URLs
+    are examined for IDs.
+    """
+    if VIDEO_LINK_MARKER not in text:
+        return
+
+    for url_match in YOUTUBE_URL_PATTERN.finditer(text):
+        start = url_match.start()
+        if not URL_PREFIX_PATTERN.search(text, max(0, start - URL_PREFIX_LENGTH), start):
+            continue
+
+        add_ids_from_url(url_match.group(), video_ids, playlist_ids)
+
+def add_ids_from_url(url: str, video_ids: Set[str], playlist_ids: Set[str]):
+    """Add the video and playlist ID of a single YouTube URL to the given sets."""
+    match = VIDEO_ID_IN_URL_PATTERN.search(url)
+    if match:
+        video_ids.add(match.group(1))
+    match = PLAYLIST_ID_IN_URL_PATTERN.search(url)
+    if match:
+        playlist_ids.add(match.group(1))
+
+def scan_youtube_ids(file_path: str) -> Tuple[Set[str], Set[str]]:
+    """
+    Scan a UTF-8 text file for YouTube video and playlist IDs in SCAN_CHUNK_SIZE chunks.
+
+    Each chunk is cut at its last whitespace so no link is split across two
+    scans.
+
+    Args:
+        file_path: Path to the file to scan
+
+    Returns:
+        Tuple of the sets of unique video IDs and playlist IDs found in the file
+    """
+    video_ids = set()
+    playlist_ids = set()
+    carry = ''
+
+    with open(file_path, 'r', encoding='utf-8') as file:
+        while True:
+            block = file.read(SCAN_CHUNK_SIZE)
+            if not block:
+                break
+
+            text = carry + block
+            # Prefer a line break; only search for other whitespace in very long lines
+            cut = (text.rfind('\n') + 1) or (max(text.rfind(' '), text.rfind('\t')) + 1)
+            if cut:
+                text, carry = text[:cut], text[cut:]
+            else:
+                # No whitespace yet; keep reading until the token ends
+                carry = text
+                continue
+
+            find_youtube_ids(text, video_ids, playlist_ids)
+
+    find_youtube_ids(carry, video_ids, playlist_ids)
+
+    return video_ids, playlist_ids
+
+def scan_youtube_ids_mmap(file_path: str, start: int = 0, end: int = None) -> Tuple[Set[str], Set[str]]:
+    """
+    Scan a file for YouTube video and playlist IDs as raw bytes through mmap.
+
+    The bytes pattern runs directly over the mapped file, one MMAP_WINDOW_SIZE
+    window at a time, so nothing is decoded and no per-line strings are built.
+    This also copes with files consisting of a single huge line. Only links
+    starting in [start, end) are reported, which lets callers split a file
+    into independent byte ranges.
+
+    Args:
+        file_path: Path to the file to scan
+        start: Offset of the first byte to scan
+        end: Offset one past the last byte to scan; defaults to the file size
+
+    Returns:
+        Tuple of the sets of unique video IDs and playlist IDs found
+    """
+    video_ids = set()
+    playlist_ids = set()
+
+    with open(file_path, 'rb') as file:
+        size = os.fstat(file.fileno()).st_size
+        end = size if end is None else min(end, size)
+        if start >= end:
+            return video_ids, playlist_ids
+
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            pos = start
+            for window_start in range(start, end, MMAP_WINDOW_SIZE):
+                window_end = min(window_start + MMAP_WINDOW_SIZE, end)
+                # Matches may extend past the window, but never start in the overlap
+                limit = min(window_end + MAX_URL_LENGTH, size)
+                pos = max(pos, window_start)
+
+                while True:
+                    pos = mapped.find(VIDEO_LINK_MARKER_BYTES, pos, min(window_end + len(VIDEO_LINK_MARKER_BYTES) - 1, size))
+                    if pos < 0:
+                        break
+
+                    url_match = YOUTUBE_URL_BYTES_PATTERN.match(mapped, pos, limit)
+                    if not url_match:
+                        pos += 1
+                        continue
+
+                    if URL_PREFIX_BYTES_PATTERN.search(mapped, max(0, pos - URL_PREFIX_LENGTH), pos):
+                        add_ids_from_url(url_match.group().decode('ascii', 'ignore'), video_ids, playlist_ids)
+                    pos = url_match.end()
+
+    return video_ids, playlist_ids
+
+def scan_file(file_path: str) -> Tuple[Set[str], Set[str]]:
+    """Scan a file with the mmap scanner if it is large, or the text scanner otherwise."""
+    if os.path.getsize(file_path) >= MMAP_SCAN_THRESHOLD:
+        return scan_youtube_ids_mmap(file_path)
+    return scan_youtube_ids(file_path)
+
+def file_fingerprint(file_path: str, offset: int) -> str:
+    """Hash the LEDGER_FINGERPRINT_SIZE bytes of a file that end at offset."""
+    start = max(0, offset - LEDGER_FINGERPRINT_SIZE)
+    with open(file_path, 'rb') as file:
+        file.seek(start)
+        return hashlib.sha1(file.read(offset - start)).hexdigest()
+
+def _scan_task(task: Tuple[str, int, int]) -> Optional[Tuple[Set[str], Set[str]]]:
+    """
+    Scan one unit of work in a worker process.
+
+    Args:
+        task: (file_path, start, end); start is None to scan the whole file
+
+    Returns:
+        Tuple of the sets of video IDs and playlist IDs found, or None if the
+        file could not be read
+    """
+    file_path, start, end = task
+    try:
+        if start is None:
+            return scan_file(file_path)
+        return scan_youtube_ids_mmap(file_path, start, end)
+    except Exception as e:
+        print(f"Error reading file {file_path}: {str(e)}")
+        return None
+
+def _scan_batch(tasks: List[Tuple[str, int, int]]) -> Tuple[Set[str], Set[str], Set[str]]:
+    """
+    Scan a batch of units of work in a worker process.
+
+    Returns:
+        Tuple of the sets of video IDs and playlist IDs found, and of the
+        paths of files that could not be read
+    """
+    video_ids = set()
+    playlist_ids = set()
+    failed_paths = set()
+    for task in tasks:
+        result = _scan_task(task)
+        if result is None:
+            failed_paths.add(task[0])
+            continue
+        video_ids.update(result[0])
+        playlist_ids.update(result[1])
+    return video_ids, playlist_ids, failed_paths
+
+def discover_files(paths: Iterable[str], extensions: Iterable[str] = DEFAULT_EXTENSIONS,
+                   max_size: Optional[int] = None) -> Iterator[str]:
+    """
+    Expand files, directories and glob patterns into file paths, lazily.
+
+    Directories are walked recursively with os.scandir and paths are yielded
+    as soon as they are found, so scanning can start before the walk ends.
+    Files found by walking or globbing are filtered by extension and size;
+    files named explicitly are always yielded. Each file is yielded once,
+    even when several paths, or a ** glob and the directories it matches,
+    cover it.
+
+    Args:
+        paths: File paths, directory paths or glob patterns (** is recursive)
+        extensions: File extensions to include, case-insensitive; empty for all
+        max_size: Skip discovered files larger than this many bytes
+
+    Yields:
+        Path of each file to scan
+    """
+    extensions = tuple('.' + extension.lower().lstrip('.') for extension in extensions)
+
+    def accept(entry) -> bool:
+        # entry is an os.DirEntry, or a path from a glob match
+        is_dir_entry = isinstance(entry, os.DirEntry)
+        name = entry.name if is_dir_entry else os.path.basename(entry)
+        if extensions and not name.lower().endswith(extensions):
+            return False
+        if max_size is None:
+            return True
+        return (entry.stat().st_size if is_dir_entry else os.path.getsize(entry)) <= max_size
+
+    seen_files = set()
+    walked_directories = set()
+
+    def first_time(file_path: str) -> bool:
+        key = os.path.abspath(file_path)
+        if key in seen_files:
+            return False
+        seen_files.add(key)
+        return True
+
+    def walk(directory: str) -> Iterator[str]:
+        # Skip directories inside one walked before, such as the
+        # subdirectories a ** glob returns after their parent
+        key = os.path.abspath(directory)
+        parent = key
+        while parent not in walked_directories:
+            parent, child = os.path.dirname(parent), parent
+            if parent == child:
+                break
+        else:
+            return
+        walked_directories.add(key)
+
+        stack = [directory]
+        while stack:
+            try:
+                with os.scandir(stack.pop()) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        elif entry.is_file() and accept(entry) and first_time(entry.path):
+                            yield entry.path
+            except OSError as e:
+                print(f"Error reading directory {e.filename}: {e.strerror}")
+
+    for path in paths:
+        if os.path.isdir(path):
+            yield from walk(path)
+        elif glob.has_magic(path):
+            for match in glob.iglob(path, recursive=True):
+                if os.path.isdir(match):
+                    yield from walk(match)
+                elif os.path.isfile(match) and accept(match) and first_time(match):
+                    yield match
+        elif first_time(path):
+            yield path
 
 class FileImportTool:
     """
@@ -10,23 +322,57 @@ class FileImportTool:
     Extracts links from plain text or Markdown format.
     """
     
-    def __init__(self):
-        """Initialize the file import tool with YouTube API connection and database."""
-        self.youtube_collector = YouTubePlaylistCollector()
-        self.db = YouTubeDatabase()
+    def __init__(self, incremental: bool = True, quota_budget: int = DEFAULT_DAILY_BUDGET):
+        """
+        Initialize the file import tool with YouTube API connection and database.
         
-        # Regular expressions for extracting YouTube video links
-        self.youtube_patterns = [
-            # Raw URL pattern: https://www.youtube.com/watch?v=VIDEO_ID
-            r'https?://(?:www\.)?youtube\.com/watch\?v=([a-zA-Z0-9_-]+)',
-            
-            # Markdown link pattern: [Title](https://www.youtube.com/watch?v=VIDEO_ID)
-            r'\[.*?\]\(https?://(?:www\.)?youtube\.com/watch\?v=([a-zA-Z0-9_-]+)\)'
-        ]
+        Args:
+            incremental: Skip files unchanged since they were last imported and
+                scan appended files only from where the last import stopped
+            quota_budget: API quota units that may be spent per day, including
+                units recorded in the database by earlier runs and other tools
+        """
+        self.db = YouTubeDatabase(pragmas=PERFORMANCE_PRAGMAS)
+        self._youtube_collector = None
+        self.incremental = incremental
+        self.quota_budget = quota_budget
+        
+        # Set once the quota budget runs out; no further API requests are made
+        self.quota_exhausted = False
+        
+        # Set when video IDs could not be imported since the last ledger flush
+        self.import_failed = False
+        
+        # Playlist IDs (list=...) seen in scanned files, kept for later expansion
+        self.found_playlist_ids = set()
+        
+        # Scan ledger loaded on first use, and entries to record once imported
+        self._scan_ledger = None
+        self._pending_ledger_entries = []
+    
+    @property
+    def youtube_collector(self):
+        """
+        YouTube API connection, created on first use.
+        
+        Authentication, API discovery and even importing the Google client
+        libraries are deferred until a video actually has to be fetched, so
+        imports that find nothing new never pay for them. The collector
+        shares this tool's database connection.
+        """
+        if self._youtube_collector is None:
+            from youtube_playlist_collector import YouTubePlaylistCollector
+            self._youtube_collector = YouTubePlaylistCollector(db=self.db, quota_budget=self.quota_budget)
+        return self._youtube_collector
     
     def extract_video_ids(self, file_path: str) -> Set[str]:
         """
-        Extract YouTube video IDs from a file by processing line by line.
+        Extract YouTube video IDs from a file in a single pass per chunk.
+        
+        Files of MMAP_SCAN_THRESHOLD bytes or more are scanned through mmap.
+        In incremental mode, files are first checked against the scan ledger.
+        
+        Playlist IDs linked in the file are added to found_playlist_ids.
         
         Args:
             file_path: Path to the file to process
@@ -38,17 +384,16 @@ class FileImportTool:
             print(f"Error: File not found: {file_path}")
             return set()
             
-        video_ids = set()
-        
         try:
-            with open(file_path, 'r', encoding='utf-8') as file:
-                # Process the file line by line instead of loading the entire content
-                for line in file:
-                    # Apply all patterns to extract video IDs from this line
-                    for pattern in self.youtube_patterns:
-                        matches = re.findall(pattern, line)
-                        video_ids.update(matches)
-                    
+            start, ledger_entry = self.plan_scan(file_path)
+            if start is None:
+                return set()
+            if start:
+                video_ids, playlist_ids = scan_youtube_ids_mmap(file_path, start)
+            else:
+                video_ids, playlist_ids = scan_file(file_path)
+            self.found_playlist_ids.update(playlist_ids)
+            self._pending_ledger_entries.append(ledger_entry)
             return video_ids
             
         except Exception as e:
@@ -65,43 +410,352 @@ class FileImportTool:
         Returns:
             List of video data dictionaries for newly added videos
         """
-        video_ids = self.extract_video_ids(file_path)
-        added_videos = []
+        added_videos = self.import_video_ids(self.extract_video_ids(file_path))
+        self.flush_scan_ledger()
+        return added_videos
+    
+    def plan_scan(self, file_path: str) -> Tuple[Optional[int], Optional[Dict]]:
+        """
+        Decide where scanning a file has to start, using the scan ledger.
         
-        for video_id in video_ids:
-            # Check if video already exists in the database
-            existing_video = self.db.get_video(video_id)
+        A file whose size, mtime and inode match its ledger entry is skipped.
+        A file that grew and whose bytes before the previous scanned offset are
+        unchanged is scanned from that offset, backed up by MAX_URL_LENGTH so a
+        link cut off by the previous scan is seen whole. Anything else is
+        scanned from the start. Once the file is scanned, the caller queues
+        the new ledger entry in _pending_ledger_entries, and flush_scan_ledger
+        records it after the file's videos are imported.
+        
+        Args:
+            file_path: Path to the file to scan
             
-            if not existing_video:
-                print(f"Fetching new video data for ID: {video_id}")
-                # Get video details from YouTube API
-                video_data = self.get_video_data(video_id)
-                
-                if video_data:
-                    # Add to database
-                    self.db.insert_video(video_data)
-                    added_videos.append(video_data)
-                    
+        Returns:
+            Tuple of the byte offset to start scanning at, or None to skip the
+            file, and the file's new ledger entry
+        """
+        stat = os.stat(file_path)
+        if self._scan_ledger is None:
+            self._scan_ledger = self.db.get_scan_ledger()
+        path = os.path.abspath(file_path)
+        # Without incremental mode the ledger is still kept up to date
+        entry = self._scan_ledger.get(path) if self.incremental else None
+        
+        if (entry
+                and entry['size'] == stat.st_size
+                and entry['mtime'] == stat.st_mtime_ns
+                and entry['inode'] == stat.st_ino):
+            return None, None
+        
+        start = 0
+        if (entry
+                and entry['inode'] == stat.st_ino
+                and stat.st_size > entry['scannedOffset']
+                and file_fingerprint(file_path, entry['scannedOffset']) == entry['fingerprint']):
+            start = max(0, entry['scannedOffset'] - MAX_URL_LENGTH)
+        
+        return start, {
+            'path': path,
+            'size': stat.st_size,
+            'mtime': stat.st_mtime_ns,
+            'inode': stat.st_ino,
+            'scannedOffset': stat.st_size,
+            'fingerprint': file_fingerprint(file_path, stat.st_size),
+            'scannedAt': datetime.now()
+        }
+    
+    def flush_scan_ledger(self):
+        """
+        Record the ledger entries of files whose videos have been imported.
+        
+        If some of the files' video IDs could not be imported, because the
+        quota budget ran out or the API failed, the entries are dropped
+        instead, so the files are scanned again by the next import.
+        """
+        if self.quota_exhausted or self.import_failed:
+            self._pending_ledger_entries = []
+            self.import_failed = False
+        if not self._pending_ledger_entries:
+            return
+        self.db.update_scan_ledger(self._pending_ledger_entries)
+        for entry in self._pending_ledger_entries:
+            self._scan_ledger[entry['path']] = entry
+        self._pending_ledger_entries = []
+    
+    def import_video_ids(self, video_ids: Set[str]) -> List[Dict]:
+        """
+        Fetch and store the videos among video_ids that are not in the database yet.
+        
+        Args:
+            video_ids: YouTube video IDs to import
+            
+        Returns:
+            List of video data dictionaries for newly added videos
+        """
+        if not video_ids:
+            return []
+        
+        # Check which videos already exist in the database with one set-based query
+        missing_ids = sorted(set(video_ids) - self.db.get_existing_video_ids(video_ids))
+        if not missing_ids:
+            return []
+        
+        # Get details of the new videos from the YouTube API, 50 per request
+        added_videos = self.get_videos_data(missing_ids)
+        
+        # Add all new videos and the quota spent on them in one transaction
+        with self.db.transaction():
+            self.db.insert_videos(added_videos)
+            if self._youtube_collector:
+                self._youtube_collector.quota.flush()
+
         return added_videos
     
-    def process_files(self, file_paths: List[str]) -> List[Dict]:
+    def process_files(self, file_paths: Iterable[str], workers: int = 1) -> List[Dict]:
         """
         Process multiple files to extract YouTube video IDs and add them to the database.
         
         Args:
-            file_paths: List of paths to files to process
+            file_paths: Paths to files to process; may be a generator such as
+                discover_files(), in which case files are processed as found
+            workers: Number of processes to scan with; above 1, all files are
+                scanned in parallel before a single import phase
             
         Returns:
             List of video data dictionaries for newly added videos
         """
         all_added_videos = []
         
-        for file_path in file_paths:
-            added_videos = self.process_file(file_path)
-            all_added_videos.extend(added_videos)
+        # Commit the whole import run at once
+        with self.db.transaction():
+            if workers > 1:
+                # Video IDs are not tracked per file, so any failed lookup
+                # keeps every file of the run out of the scan ledger
+                all_added_videos = self.import_video_ids(self.scan_files_parallel(file_paths, workers))
+                self.flush_scan_ledger()
+            else:
+                for file_path in file_paths:
+                    added_videos = self.process_file(file_path)
+                    all_added_videos.extend(added_videos)
             
         return all_added_videos
     
+    def scan_files_parallel(self, file_paths: Iterable[str], workers: int) -> Set[str]:
+        """
+        Extract YouTube video IDs from many files across a process pool.
+        
+        Files of MMAP_SCAN_THRESHOLD bytes or more are split into
+        PARALLEL_SCAN_CHUNK_SIZE byte ranges scanned independently, so one
+        huge file is spread over all workers too, while small files are sent
+        in batches of about PARALLEL_SCAN_BATCH_SIZE bytes. Work is submitted
+        as file_paths yields, so a lazy discovery keeps workers busy from the
+        first file found. Playlist IDs are added to found_playlist_ids, and
+        the ledger entries of the files read without errors are queued in
+        _pending_ledger_entries.
+        
+        Args:
+            file_paths: Paths to files to scan; may be a generator
+            workers: Number of worker processes
+            
+        Returns:
+            Set of unique YouTube video IDs found in all files
+        """
+        video_ids = set()
+        ledger_entries = {}
+        failed_paths = set()
+        
+        def collect(futures):
+            for future in futures:
+                batch_video_ids, batch_playlist_ids, batch_failed_paths = future.result()
+                video_ids.update(batch_video_ids)
+                self.found_playlist_ids.update(batch_playlist_ids)
+                failed_paths.update(batch_failed_paths)
+        
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            pending = set()
+            batch = []
+            batch_size = 0
+            
+            for task, task_size in self._scan_tasks(file_paths, ledger_entries):
+                batch.append(task)
+                batch_size += task_size
+                if batch_size < PARALLEL_SCAN_BATCH_SIZE:
+                    continue
+                
+                pending.add(executor.submit(_scan_batch, batch))
+                batch = []
+                batch_size = 0
+                # Bound the work queued ahead of the workers
+                if len(pending) >= workers * 2:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    collect(done)
+            
+            if batch:
+                pending.add(executor.submit(_scan_batch, batch))
+            collect(pending)
+        
+        self._pending_ledger_entries.extend(
+            entry for file_path, entry in ledger_entries.items() if file_path not in failed_paths)
+        return video_ids
+    
+    def _scan_tasks(self, file_paths: Iterable[str],
+                    ledger_entries: Dict[str, Dict]) -> Iterator[Tuple[Tuple[str, int, int], int]]:
+        """
+        Turn file paths into units of work for the process pool.
+        
+        Args:
+            file_paths: Paths to files to scan
+            ledger_entries: Filled with the new ledger entry of each file to
+                scan, keyed by file path
+        
+        Yields:
+            ((file_path, start, end), number of bytes to scan) per unit of work
+        """
+        for file_path in file_paths:
+            if not os.path.exists(file_path):
+                print(f"Error: File not found: {file_path}")
+                continue
+            
+            try:
+                start, ledger_entry = self.plan_scan(file_path)
+                size = os.path.getsize(file_path)
+            except OSError as e:
+                print(f"Error reading file {file_path}: {str(e)}")
+                continue
+            if start is None:
+                continue
+            ledger_entries[file_path] = ledger_entry
+            
+            if size - start >= MMAP_SCAN_THRESHOLD:
+                for offset in range(start, size, PARALLEL_SCAN_CHUNK_SIZE):
+                    yield (file_path, offset, offset + PARALLEL_SCAN_CHUNK_SIZE), PARALLEL_SCAN_CHUNK_SIZE
+            elif start:
+                yield (file_path, start, None), size - start
+            else:
+                yield (file_path, None, None), size
+    
+    def process_stream(self, stream: TextIO, batch_size: int = STREAM_BATCH_SIZE,
+                       flush_interval: float = STREAM_FLUSH_INTERVAL,
+                       dedup_window: int = STREAM_DEDUP_WINDOW) -> int:
+        """
+        Continuously import YouTube links from a text stream such as stdin.
+        
+        Lines are read on a background thread so pending IDs are flushed on
+        time even while the stream is idle. IDs seen within the last
+        dedup_window distinct IDs are ignored, and new ones are resolved and
+        stored in micro-batches of batch_size IDs or every flush_interval
+        seconds, whichever comes first. New videos are printed as each batch
+        is stored rather than collected, so memory stays bounded however long
+        the stream runs. Runs until the stream ends or the process is
+        interrupted.
+        
+        Args:
+            stream: Text stream to read lines from
+            batch_size: Number of pending IDs that triggers a flush
+            flush_interval: Maximum seconds an ID waits before being flushed
+            dedup_window: Number of recently seen IDs remembered for deduplication
+            
+        Returns:
+            Number of newly added videos
+        """
+        lines = queue.Queue(maxsize=10000)
+        end_of_stream = object()
+        
+        def read_lines():
+            try:
+                for line in stream:
+                    lines.put(line)
+            finally:
+                lines.put(end_of_stream)
+        
+        threading.Thread(target=read_lines, daemon=True).start()
+        
+        recent_ids = OrderedDict()
+        pending_ids = set()
+        flush_deadline = None
+        added_count = 0
+        
+        def flush():
+            nonlocal added_count
+            batch_videos = self.import_video_ids(pending_ids)
+            for video in batch_videos:
+                print(f" + {video['title']} (ID: {video['id']})", flush=True)
+            added_count += len(batch_videos)
+            pending_ids.clear()
+        
+        try:
+            while True:
+                timeout = None if flush_deadline is None else max(0.0, flush_deadline - time.monotonic())
+                try:
+                    line = lines.get(timeout=timeout)
+                except queue.Empty:
+                    line = None
+                if line is end_of_stream:
+                    break
+                
+                if line is not None:
+                    line_video_ids = set()
+                    find_youtube_ids(line, line_video_ids, self.found_playlist_ids)
+                    for video_id in line_video_ids:
+                        if video_id in recent_ids:
+                            recent_ids.move_to_end(video_id)
+                            continue
+                        recent_ids[video_id] = None
+                        if len(recent_ids) > dedup_window:
+                            recent_ids.popitem(last=False)
+                        pending_ids.add(video_id)
+                        if flush_deadline is None:
+                            flush_deadline = time.monotonic() + flush_interval
+                
+                if pending_ids and (len(pending_ids) >= batch_size or time.monotonic() >= flush_deadline):
+                    flush()
+                    flush_deadline = None
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if pending_ids:
+                flush()
+        
+        return added_count
+    
+    def get_videos_data(self, video_ids: List[str]) -> List[Dict]:
+        """
+        Get video data for many videos from the YouTube API, 50 IDs per request.
+        
+        Args:
+            video_ids: YouTube video IDs
+            
+        Returns:
+            List of video data dictionaries for the videos found on YouTube
+        """
+        from youtube_playlist_collector import MAX_VIDEO_IDS_PER_REQUEST
+        
+        videos = []
+        
+        for start in range(0, len(video_ids), MAX_VIDEO_IDS_PER_REQUEST):
+            if self.quota_exhausted:
+                print(f"Skipping {len(video_ids) - start} IDs: quota budget exhausted")
+                break
+            chunk = video_ids[start:start + MAX_VIDEO_IDS_PER_REQUEST]
+            print(f"Fetching new video data for {len(chunk)} IDs")
+            try:
+                chunk_videos = self.youtube_collector.get_videos(chunk)
+            except QuotaExceededError as e:
+                print(str(e))
+                self.quota_exhausted = True
+                continue
+            except Exception as e:
+                print(f"Error fetching video data for IDs {', '.join(chunk)}: {str(e)}")
+                self.import_failed = True
+                continue
+            
+            found_ids = {video['id'] for video in chunk_videos}
+            for video_id in chunk:
+                if video_id not in found_ids:
+                    print(f"Video with ID {video_id} not found on YouTube")
+            videos.extend(chunk_videos)
+            
+        return videos
+    
     def get_video_data(self, video_id: str) -> Dict:
         """
         Get video data from the YouTube API.
@@ -112,33 +766,29 @@ class FileImportTool:
         Returns:
             Dictionary containing video data
         """
+        from youtube_playlist_collector import VIDEOS_PART, VIDEOS_FIELDS, parse_video
+        
         try:
             # Use the YouTube API to get video details
             video_request = self.youtube_collector.youtube.videos().list(
-                part="snippet",
+                part=VIDEOS_PART,
+                fields=VIDEOS_FIELDS,
                 id=video_id
             )
-            video_response = video_request.execute()
+            video_response = self.youtube_collector.execute_request(video_request)
+            self.youtube_collector.quota.flush()
             
             if video_response['items']:
-                video_item = video_response['items'][0]
-                
                 # Format data to match database schema
-                from datetime import datetime
-                video_data = {
-                    'etag': video_item['etag'],
-                    'id': video_item['id'],
-                    'title': video_item['snippet']['title'],
-                    'description': video_item['snippet']['description'],
-                    'publishedAt': datetime.fromisoformat(video_item['snippet']['publishedAt'].replace('Z', '+00:00')),
-                    'channelId': video_item['snippet']['channelId'],
-                    'channelTitle': video_item['snippet']['channelTitle']
-                }
-                return video_data
+                return parse_video(video_response['items'][0])
             else:
                 print(f"Video with ID {video_id} not found on YouTube")
                 return None
                 
+        except QuotaExceededError as e:
+            print(str(e))
+            self.quota_exhausted = True
+            return None
         except Exception as e:
             print(f"Error fetching video data for ID {video_id}: {str(e)}")
             return None
@@ -146,20 +796,45 @@ class FileImportTool:
 
 def main():
     """Example usage of the FileImportTool."""
+    import argparse
     import sys
     
-    if len(sys.argv) < 2:
-        print("Usage: python file_import_tool.py file1.txt [file2.txt ...]")
-        sys.exit(1)
-        
-    file_paths = sys.argv[1:]
+    parser = argparse.ArgumentParser(description="Import YouTube video links from text and Markdown files.")
+    parser.add_argument('paths', nargs='+', metavar='path',
+                        help="file, directory (walked recursively) or glob pattern to scan for YouTube links, "
+                             "or - to stream from standard input")
+    parser.add_argument('--ext', action='append', dest='extensions',
+                        help="file extension to include from directories and globs; repeatable "
+                             f"(default: {' '.join(DEFAULT_EXTENSIONS)})")
+    parser.add_argument('--max-size', type=int, help="skip files from directories and globs larger than this many bytes")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="number of processes to scan files with (default: 1)")
+    parser.add_argument('--full', action='store_true',
+                        help="rescan every file from the start, ignoring the scan ledger")
+    parser.add_argument('--quota-budget', type=int, default=DEFAULT_DAILY_BUDGET,
+                        help="API quota units to spend per day, counting earlier runs (default: %(default)s)")
+    args = parser.parse_args()
     
-    importer = FileImportTool()
-    added_videos = importer.process_files(file_paths)
+    importer = FileImportTool(incremental=not args.full, quota_budget=args.quota_budget)
+    if args.paths == ['-']:
+        # Streaming mode: python file_import_tool.py - < chat.log; new videos
+        # are listed as they are stored
+        added_count = importer.process_stream(sys.stdin)
+        importer.db.close()
+        print(f"\nAdded {added_count} new videos to the database")
+    else:
+        file_paths = discover_files(args.paths, args.extensions or DEFAULT_EXTENSIONS, args.max_size)
+        added_videos = importer.process_files(file_paths, workers=args.workers)
+        importer.db.close()
+        
+        print(f"\nAdded {len(added_videos)} new videos to the database:")
+        for video in added_videos:
+            print(f" - {video['title']} (ID: {video['id']})")
     
-    print(f"\nAdded {len(added_videos)} new videos to the database:")
-    for video in added_videos:
-        print(f" - {video['title']} (ID: {video['id']})")
+    if importer.found_playlist_ids:
+        print(f"\nFound {len(importer.found_playlist_ids)} playlist links:")
+        for playlist_id in sorted(importer.found_playlist_ids):
+            print(f" - {playlist_id}")
     
 
 if __name__ == "__main__":
@@ -0,0 +1,127 @@
+import sqlite3
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from database import YouTubeDatabase
+
+try:
+    # The daily quota resets at midnight Pacific time
+    QUOTA_TIMEZONE = ZoneInfo('America/Los_Angeles')
+except ZoneInfoNotFoundError:
+    # No time zone database available; ignore daylight saving time
+    QUOTA_TIMEZONE = timezone(timedelta(hours=-8))
+
+# Default daily quota of a YouTube Data API project
+DEFAULT_DAILY_BUDGET = 10000
+
+# Quota units charged per request, keyed by API method ID. A 304 Not Modified
+# answer to a conditional request is charged like any other request.
+QUOTA_COSTS = {
+    'youtube.playlists.list': 1,
+    'youtube.playlistItems.list': 1,
+    'youtube.videos.list': 1
+}
+
+# Cost of methods missing from QUOTA_COSTS; write methods cost 50
+DEFAULT_QUOTA_COST = 50
+
+class QuotaExceededError(Exception):
+    """Raised instead of issuing a request that would exceed the quota budget."""
+
+def quota_day(now: Optional[datetime] = None) -> str:
+    """Return the quota day, in Pacific time, that now falls in."""
+    return (now or datetime.now(timezone.utc)).astimezone(QUOTA_TIMEZONE).date().isoformat()
+
+class QuotaLedger:
+    """
+    Charges API requests against a daily quota budget.
+
+    Units spent earlier in the day by any tool sharing the database count
+    against the budget. charge() may be called from worker threads; the
+    charges are written to the quota_ledger table by flush(), which must be
+    called from the thread that owns the database connection. Charges
+    flushed inside a transaction that is rolled back are written again
+    afterwards, since the API has spent the units either way.
+    """
+
+    def __init__(self, db: YouTubeDatabase, daily_budget: int = DEFAULT_DAILY_BUDGET):
+        """
+        Args:
+            db: Database holding the quota ledger
+            daily_budget: Quota units that may be spent per quota day
+        """
+        self.db = db
+        self.daily_budget = daily_budget
+        self.day = quota_day()
+        self._used = db.get_quota_usage(self.day)
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    @property
+    def used(self) -> int:
+        """Quota units spent today, including charges not flushed yet."""
+        return self._used
+
+    @property
+    def remaining(self) -> int:
+        """Quota units left in today's budget."""
+        return max(0, self.daily_budget - self._used)
+
+    @staticmethod
+    def cost(method_id: str) -> int:
+        """Return the quota cost of one request to an API method."""
+        return QUOTA_COSTS.get(method_id, DEFAULT_QUOTA_COST)
+
+    def charge(self, method_id: str):
+        """
+        Charge one request to an API method against the budget.
+
+        Args:
+            method_id: API method ID, e.g. 'youtube.videos.list'
+
+        Raises:
+            QuotaExceededError: If the request would exceed the budget
+        """
+        cost = self.cost(method_id)
+        with self._lock:
+            day = quota_day()
+            if day != self.day:
+                # The quota was reset at midnight Pacific time
+                self.day = day
+                self._used = 0
+            if self._used + cost > self.daily_budget:
+                raise QuotaExceededError(
+                    f"Quota budget exhausted: {self._used} of {self.daily_budget} units used on {self.day}")
+            self._used += cost
+            units, requests = self._pending.get((day, method_id), (0, 0))
+            self._pending[(day, method_id)] = (units + cost, requests + 1)
+
+    def flush(self):
+        """Write the charges made since the last flush to the database."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return
+        try:
+            self.db.add_quota_usage(pending)
+        except BaseException:
+            self._requeue(pending)
+            raise
+        self.db.on_rollback(lambda: self._rewrite(pending))
+
+    def _requeue(self, charges: Dict[Tuple[str, str], Tuple[int, int]]):
+        """Put charges that were not recorded back in front of the next flush."""
+        with self._lock:
+            for key, (units, requests) in charges.items():
+                pending_units, pending_requests = self._pending.get(key, (0, 0))
+                self._pending[key] = (pending_units + units, pending_requests + requests)
+
+    def _rewrite(self, charges: Dict[Tuple[str, str], Tuple[int, int]]):
+        """Record charges again after the transaction they were flushed in was rolled back."""
+        self._requeue(charges)
+        try:
+            self.flush()
+        except sqlite3.Error as e:
+            # Kept pending for the next flush
+            print(f"Could not record quota usage: {e}")
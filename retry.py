@@ -0,0 +1,181 @@
+import asyncio
+import json
+import random
+import threading
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Optional, TypeVar
+
+# Responses worth retrying: rate limiting and server errors
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+# 403 reasons that mean "slow down" rather than "not allowed"; quotaExceeded
+# is left out, since the daily quota does not come back by retrying
+RETRYABLE_403_REASONS = {'rateLimitExceeded', 'userRateLimitExceeded'}
+
+# Retries per request, and the backoff cap the exponential delays grow towards
+MAX_RETRIES = 5
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 60.0
+
+# Circuit breaker: opens when at least BREAKER_MIN_FAILURES of the last
+# BREAKER_WINDOW outcomes are failures and they make up BREAKER_FAILURE_RATE
+# of them, pausing every request for BREAKER_COOLDOWN seconds
+BREAKER_WINDOW = 20
+BREAKER_MIN_FAILURES = 5
+BREAKER_FAILURE_RATE = 0.5
+BREAKER_COOLDOWN = 30.0
+
+T = TypeVar('T')
+
+def error_reason(content: bytes) -> Optional[str]:
+    """Return the reason of the first error in an API error response body."""
+    try:
+        return json.loads(content)['error']['errors'][0]['reason']
+    except (ValueError, KeyError, IndexError, TypeError):
+        return None
+
+def is_retryable_status(status: int, reason: Optional[str] = None) -> bool:
+    """Return whether an error response with this status and reason is transient."""
+    return status in RETRYABLE_STATUSES or (status == 403 and reason in RETRYABLE_403_REASONS)
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header, given in seconds or as an HTTP date, into seconds."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+class CircuitBreaker:
+    """
+    Pauses all requests while the recent failure rate is too high.
+
+    Shared by every worker thread or task of a sync, so when the API starts
+    failing they all back off together instead of each burning its retries.
+    """
+
+    def __init__(self, window: int = BREAKER_WINDOW, min_failures: int = BREAKER_MIN_FAILURES,
+                 failure_rate: float = BREAKER_FAILURE_RATE, cooldown: float = BREAKER_COOLDOWN):
+        """
+        Args:
+            window: Number of recent request outcomes considered
+            min_failures: Failures in the window needed to open the circuit
+            failure_rate: Fraction of failures in the window needed to open it
+            cooldown: Seconds requests are paused once the circuit opens
+        """
+        self.min_failures = min_failures
+        self.failure_rate = failure_rate
+        self.cooldown = cooldown
+        self._outcomes = deque(maxlen=window)
+        self._open_until = 0.0
+        self._lock = threading.Lock()
+
+    def pause_remaining(self) -> float:
+        """Return the seconds left until requests may be sent again."""
+        return max(0.0, self._open_until - time.monotonic())
+
+    def record(self, failed: bool):
+        """Record the outcome of a request, opening the circuit if failures spike."""
+        with self._lock:
+            self._outcomes.append(failed)
+            failures = sum(self._outcomes)
+            if failures >= self.min_failures and failures >= self.failure_rate * len(self._outcomes):
+                self._open_until = time.monotonic() + self.cooldown
+                self._outcomes.clear()
+                print(f"Too many failing requests, pausing for {self.cooldown:g}s")
+
+class Retrier:
+    """
+    Runs API requests with classified retries.
+
+    Transient failures are retried with exponential backoff and full jitter,
+    waiting at least as long as a Retry-After header asks. Every attempt
+    first waits for the shared circuit breaker. Which failures are transient
+    is decided by a classify callable, since each transport raises its own
+    errors.
+    """
+
+    def __init__(self, max_retries: int = MAX_RETRIES, backoff_base: float = BACKOFF_BASE,
+                 backoff_max: float = BACKOFF_MAX, breaker: Optional[CircuitBreaker] = None):
+        """
+        Args:
+            max_retries: Retries per request before the last error is raised
+            backoff_base: Delay cap of the first retry, in seconds
+            backoff_max: Largest delay cap, in seconds
+            breaker: Circuit breaker to share; a new one is created when omitted
+        """
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker = breaker or CircuitBreaker()
+
+    def backoff_delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Return the delay before retry number attempt, counting from 0."""
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        return max(delay, retry_after or 0.0)
+
+    def call(self, function: Callable[[], T], classify: Callable[[Exception], Optional[float]]) -> T:
+        """
+        Call function, retrying it on transient failures.
+
+        Args:
+            function: Performs one attempt of the request
+            classify: Returns None for errors that must not be retried, and
+                otherwise the Retry-After delay in seconds, or 0 without one
+
+        Returns:
+            The result of the first successful attempt
+        """
+        attempt = 0
+        while True:
+            time.sleep(self.breaker.pause_remaining())
+            try:
+                result = function()
+            except Exception as e:
+                delay = self._retry_delay(e, attempt, classify)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                attempt += 1
+                continue
+            self.breaker.record(False)
+            return result
+
+    async def call_async(self, function: Callable[[], Awaitable[T]],
+                         classify: Callable[[Exception], Optional[float]]) -> T:
+        """Async counterpart of call."""
+        attempt = 0
+        while True:
+            await asyncio.sleep(self.breaker.pause_remaining())
+            try:
+                result = await function()
+            except Exception as e:
+                delay = self._retry_delay(e, attempt, classify)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+            self.breaker.record(False)
+            return result
+
+    def _retry_delay(self, error: Exception, attempt: int,
+                     classify: Callable[[Exception], Optional[float]]) -> Optional[float]:
+        """Return how long to wait before retrying after error, or None to give up."""
+        retry_after = classify(error)
+        if retry_after is None:
+            return None
+        self.breaker.record(True)
+        if attempt >= self.max_retries:
+            return None
+        delay = self.backoff_delay(attempt, retry_after)
+        print(f"Request failed ({error}), retrying in {delay:.1f}s")
+        return delay
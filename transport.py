@@ -0,0 +1,159 @@
+import socket
+from abc import ABC, abstractmethod
+import threading
+from typing import Dict, Optional, Tuple
+import httplib2
+import requests
+from requests.adapters import HTTPAdapter
+from google.auth.transport.requests import Request
+
+# Transports build_service can use: httplib2 is googleapiclient's default,
+# a fresh unpooled connection per service; pooled shares a requests session
+# between all services and threads; http2 multiplexes over httpx
+TRANSPORTS = ('httplib2', 'pooled', 'http2')
+DEFAULT_TRANSPORT = 'httplib2'
+
+# Connections kept alive per host, and seconds to wait to connect or for data
+DEFAULT_POOL_SIZE = 10
+DEFAULT_TIMEOUT = 60.0
+
+# Response headers describing the raw body, which the transports have already decoded
+DECODED_HEADERS = ('content-encoding', 'content-length', 'transfer-encoding')
+
+class Transport(ABC):
+    """
+    Stand-in for httplib2.Http that googleapiclient can send requests through.
+
+    Adds the credentials' Authorization header, refreshing the token when it
+    expires, and returns responses as httplib2 does. Subclasses implement
+    send() on top of a connection pool that is safe to share between threads,
+    and turn its timeouts and connection failures into socket.timeout and
+    ConnectionError, so Retrier classifies them like httplib2's.
+    """
+
+    def __init__(self, credentials):
+        """
+        Args:
+            credentials: google-auth credentials to authorize requests with
+        """
+        self.credentials = credentials
+        self._refresh_request = Request()
+        self._refresh_lock = threading.Lock()
+
+    def request(self, uri: str, method: str = 'GET', body=None, headers: Optional[Dict] = None,
+                redirections: int = 5, connection_type=None) -> Tuple[httplib2.Response, bytes]:
+        """Send a request; same signature and return value as httplib2.Http.request."""
+        headers = dict(headers or {})
+        with self._refresh_lock:
+            self.credentials.before_request(self._refresh_request, method, uri, headers)
+
+        status, reason, response_headers, content = self.send(method, uri, body, headers)
+
+        response = httplib2.Response({
+            key.lower(): value for key, value in response_headers.items()
+            if key.lower() not in DECODED_HEADERS
+        })
+        response.status = status
+        response['status'] = str(status)
+        response.reason = reason
+        return response, content
+
+    @abstractmethod
+    def send(self, method: str, uri: str, body, headers: Dict) -> Tuple[int, str, Dict, bytes]:
+        """
+        Send a request over the pool.
+
+        Returns:
+            Status code, reason phrase, response headers and decoded body
+        """
+
+    def close(self):
+        """Close the pooled connections."""
+
+class PooledTransport(Transport):
+    """Transport over a requests session with a keep-alive urllib3 connection pool."""
+
+    def __init__(self, credentials, pool_size: int = DEFAULT_POOL_SIZE, timeout: float = DEFAULT_TIMEOUT):
+        """
+        Args:
+            credentials: google-auth credentials to authorize requests with
+            pool_size: Connections kept alive per host
+            timeout: Seconds to wait to connect or for data
+        """
+        super().__init__(credentials)
+        self.timeout = timeout
+        self.session = requests.Session()
+        # Retrying is left to Retrier
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def send(self, method: str, uri: str, body, headers: Dict) -> Tuple[int, str, Dict, bytes]:
+        try:
+            response = self.session.request(method, uri, data=body, headers=headers, timeout=self.timeout)
+        except requests.exceptions.Timeout as e:
+            raise socket.timeout(str(e)) from e
+        except requests.exceptions.ConnectionError as e:
+            raise ConnectionError(str(e)) from e
+        return response.status_code, response.reason, response.headers, response.content
+
+    def close(self):
+        self.session.close()
+
+class Http2Transport(Transport):
+    """
+    Transport over an httpx client speaking HTTP/2 where the server supports it.
+
+    Concurrent requests to the API share a single multiplexed connection.
+    Needs the optional httpx and h2 packages: pip install 'httpx[http2]'
+    """
+
+    def __init__(self, credentials, pool_size: int = DEFAULT_POOL_SIZE, timeout: float = DEFAULT_TIMEOUT):
+        """
+        Args:
+            credentials: google-auth credentials to authorize requests with
+            pool_size: Maximum number of open connections
+            timeout: Seconds to wait to connect or for data
+        """
+        try:
+            import httpx
+            import h2  # noqa: F401 - httpx needs it for http2=True
+        except ImportError as e:
+            raise ImportError("The http2 transport requires httpx with HTTP/2 support: "
+                              "pip install 'httpx[http2]'") from e
+
+        super().__init__(credentials)
+        self.client = httpx.Client(
+            http2=True,
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+        )
+        self._httpx = httpx
+
+    def send(self, method: str, uri: str, body, headers: Dict) -> Tuple[int, str, Dict, bytes]:
+        try:
+            response = self.client.request(method, uri, content=body, headers=headers)
+        except self._httpx.TimeoutException as e:
+            raise socket.timeout(str(e)) from e
+        except (self._httpx.NetworkError, self._httpx.RemoteProtocolError) as e:
+            raise ConnectionError(str(e)) from e
+        return response.status_code, response.reason_phrase, response.headers, response.content
+
+    def close(self):
+        self.client.close()
+
+def create_transport(name: str, credentials, pool_size: int = DEFAULT_POOL_SIZE,
+                     timeout: float = DEFAULT_TIMEOUT) -> Optional[Transport]:
+    """
+    Create the named transport.
+
+    Returns:
+        The transport, or None for httplib2, which build() sets up itself
+    """
+    if name == 'httplib2':
+        return None
+    if name == 'pooled':
+        return PooledTransport(credentials, pool_size, timeout)
+    if name == 'http2':
+        return Http2Transport(credentials, pool_size, timeout)
+    raise ValueError(f"Unknown transport: {name}")
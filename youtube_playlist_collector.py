@@ -1,25 +1,203 @@
 import os
-from typing import List, Dict
+import math
+import socket
+import time
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, List, Dict, Optional, Tuple
 from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
+from googleapiclient.http import BatchHttpRequest
 from google_auth_oauthlib.flow import InstalledAppFlow
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
 import pickle
 from dotenv import load_dotenv
-from database import YouTubeDatabase
-from datetime import datetime
+from database import YouTubeDatabase, PERFORMANCE_PRAGMAS
+from quota import QuotaLedger, QuotaExceededError, DEFAULT_DAILY_BUDGET
+from retry import Retrier, error_reason, is_retryable_status, parse_retry_after
+from transport import TRANSPORTS, DEFAULT_TRANSPORT, DEFAULT_POOL_SIZE, DEFAULT_TIMEOUT, create_transport
+from datetime import datetime, timedelta
 
 # Load environment variables
 load_dotenv()
 
+# Optional API root override, e.g. a local fake API server for benchmarks
+API_ENDPOINT = os.getenv('YOUTUBE_API_ENDPOINT')
+
+# The videos endpoint accepts at most 50 comma-separated IDs per request
+MAX_VIDEO_IDS_PER_REQUEST = 50
+
+# API calls grouped into one batch request in batch mode
+BATCH_SIZE = 50
+
+# new_batch_http_request() ignores the api_endpoint override, so the batch
+# endpoint (the discovery document's rootUrl + batchPath) is built here
+BATCH_URI = (API_ENDPOINT or 'https://youtube.googleapis.com/').rstrip('/') + '/batch'
+
+# page_etag request key prefix of the authenticated user's playlists listing
+PLAYLISTS_KEY_PREFIX = 'playlists:mine:'
+
+# Stored videos fetched more recently than this are not requested again
+VIDEO_MAX_AGE = timedelta(hours=24)
+
+# Table column -> path of the attribute in the API resource it is mapped from.
+# Request parts and fields masks are derived from these, so responses carry
+# exactly the attributes the playlist, playlist_item and video tables store.
+PLAYLIST_FIELD_MAP = {
+    'etag': 'etag',
+    'id': 'id',
+    'publishedAt': 'snippet/publishedAt',
+    'channelId': 'snippet/channelId',
+    'title': 'snippet/title',
+    'description': 'snippet/description',
+    'itemCount': 'contentDetails/itemCount'
+}
+# playlistId is not read from the resource; it is the playlist being listed
+PLAYLIST_ITEM_FIELD_MAP = {
+    'etag': 'etag',
+    'id': 'id',
+    'videoId': 'contentDetails/videoId',
+    'position': 'snippet/position'
+}
+VIDEO_FIELD_MAP = {
+    'etag': 'etag',
+    'id': 'id',
+    'title': 'snippet/title',
+    'description': 'snippet/description',
+    'publishedAt': 'snippet/publishedAt',
+    'channelId': 'snippet/channelId',
+    'channelTitle': 'snippet/channelTitle'
+}
+
+def build_part(field_map: Dict[str, str]) -> str:
+    """Build the part parameter covering every resource part in a field map."""
+    parts = [path.split('/')[0] for path in field_map.values() if '/' in path]
+    return ','.join(dict.fromkeys(parts))
+
+def build_fields_mask(field_map: Dict[str, str], *response_fields: str) -> str:
+    """
+    Build a fields mask selecting the mapped attributes of each item.
+
+    Args:
+        field_map: Column to resource path mapping
+        response_fields: Top-level response fields to keep, e.g. nextPageToken
+
+    Returns:
+        Mask such as 'nextPageToken,items(id,snippet(title))'
+    """
+    tree = {}
+    for path in field_map.values():
+        node = tree
+        for name in path.split('/'):
+            node = node.setdefault(name, {})
+
+    def render(node: Dict) -> str:
+        return ','.join(name + (f'({render(children)})' if children else '') for name, children in node.items())
+
+    return ','.join(response_fields + (f'items({render(tree)})',))
+
+PLAYLISTS_PART = build_part(PLAYLIST_FIELD_MAP)
+PLAYLISTS_FIELDS = build_fields_mask(PLAYLIST_FIELD_MAP, 'etag', 'nextPageToken')
+PLAYLIST_ITEMS_PART = build_part(PLAYLIST_ITEM_FIELD_MAP)
+PLAYLIST_ITEMS_FIELDS = build_fields_mask(PLAYLIST_ITEM_FIELD_MAP, 'etag', 'nextPageToken')
+VIDEOS_PART = build_part(VIDEO_FIELD_MAP)
+VIDEOS_FIELDS = build_fields_mask(VIDEO_FIELD_MAP)
+
+def parse_timestamp(value: str) -> datetime:
+    """Parse an API timestamp such as 2020-01-01T00:00:00Z."""
+    return datetime.fromisoformat(value.replace('Z', '+00:00'))
+
+def map_fields(item: Dict, field_map: Dict[str, str]) -> Dict:
+    """Extract the mapped attributes of an API resource into a table row."""
+    row = {}
+    for column, path in field_map.items():
+        value = item
+        for name in path.split('/'):
+            value = value[name]
+        row[column] = value
+    return row
+
+def parse_playlist(item: Dict) -> Dict:
+    """Map a playlists resource to a playlist table row."""
+    playlist_data = map_fields(item, PLAYLIST_FIELD_MAP)
+    playlist_data['publishedAt'] = parse_timestamp(playlist_data['publishedAt'])
+    return playlist_data
+
+def parse_playlist_item(item: Dict, playlist_id: str) -> Dict:
+    """Map a playlistItems resource to a playlist_item table row."""
+    playlist_item_data = map_fields(item, PLAYLIST_ITEM_FIELD_MAP)
+    playlist_item_data['playlistId'] = playlist_id
+    return playlist_item_data
+
+def parse_video(item: Dict) -> Dict:
+    """Map a videos resource to a video table row."""
+    video_data = map_fields(item, VIDEO_FIELD_MAP)
+    video_data['publishedAt'] = parse_timestamp(video_data['publishedAt'])
+    video_data['fetchedAt'] = datetime.now()
+    return video_data
+
+def classify_api_error(error: Exception) -> Optional[float]:
+    """
+    Classify an error raised by request.execute() for Retrier.
+
+    Returns:
+        None if the error is permanent, otherwise the delay in seconds the
+        server asked for with Retry-After, or 0 without one
+    """
+    if isinstance(error, HttpError):
+        if is_retryable_status(error.resp.status, error_reason(error.content)):
+            return parse_retry_after(error.resp.get('retry-after')) or 0.0
+        return None
+    if isinstance(error, (socket.timeout, ConnectionError)):
+        return 0.0
+    return None
+
 class YouTubePlaylistCollector:
-    def __init__(self):
+    def __init__(self, db: Optional[YouTubeDatabase] = None, video_max_age: timedelta = VIDEO_MAX_AGE,
+                 quota_budget: int = DEFAULT_DAILY_BUDGET, retrier: Optional[Retrier] = None,
+                 transport: str = DEFAULT_TRANSPORT, pool_size: int = DEFAULT_POOL_SIZE,
+                 timeout: float = DEFAULT_TIMEOUT, batch: bool = False):
+        """
+        Args:
+            db: Database to store results in; a new connection to the default
+                database is opened when omitted
+            video_max_age: Stored videos fetched more recently than this are
+                reused instead of being requested again
+            quota_budget: API quota units that may be spent per day, including
+                units recorded in the database by earlier runs
+            retrier: Retry policy and circuit breaker shared by all requests;
+                the defaults from retry.py are used when omitted
+            transport: HTTP transport from transport.TRANSPORTS; the pooled
+                ones share warm connections between all worker threads
+            pool_size: Connections the pooled transports keep alive
+            timeout: Seconds the pooled transports wait to connect or for data
+            batch: Group independent requests into batch requests of
+                BATCH_SIZE calls when syncing
+        """
         self.youtube = None
         self.credentials = None
+        self.http = None
+        self.transport = transport
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.batch = batch
         self.SCOPES = ['https://www.googleapis.com/auth/youtube.readonly']
         self.API_SERVICE_NAME = 'youtube'
         self.API_VERSION = 'v3'
-        self.db = YouTubeDatabase()
+        # Playlists whose stored items are known to be current for this run
+        self.unchanged_playlist_ids = set()
+        # Playlists not stored before this run, and playlists whose items still need syncing
+        self.new_playlist_ids = set()
+        self.pending_playlist_ids = set()
+        # Videos fetched during this run or recently enough to reuse, loaded on first sync
+        self.video_max_age = video_max_age
+        self.resolved_video_ids = None
+        self._video_lock = threading.Lock()
+        self.db = db or YouTubeDatabase(pragmas=PERFORMANCE_PRAGMAS)
+        self.quota = QuotaLedger(self.db, quota_budget)
+        self.retrier = retrier or Retrier()
         self.authenticate()
 
     def authenticate(self):
@@ -44,34 +222,134 @@ class YouTubePlaylistCollector:
                 pickle.dump(creds, token)
 
         self.credentials = creds
-        self.youtube = build(self.API_SERVICE_NAME, self.API_VERSION, credentials=creds)
+        self.http = create_transport(self.transport, creds, self.pool_size, self.timeout)
+        self.youtube = self.build_service()
+
+    def build_service(self):
+        """
+        Build a YouTube API service object from the loaded credentials.
+
+        The discovery document bundled with google-api-python-client is used
+        instead of fetching it over the network, so building a service costs
+        a few milliseconds of local parsing. With a pooled transport, every
+        service sends its requests through the same shared connection pool.
+        """
+        client_options = {'api_endpoint': API_ENDPOINT} if API_ENDPOINT else None
+        if self.http:
+            return build(self.API_SERVICE_NAME, self.API_VERSION, http=self.http,
+                         client_options=client_options, static_discovery=True)
+        return build(self.API_SERVICE_NAME, self.API_VERSION, credentials=self.credentials,
+                     client_options=client_options, static_discovery=True)
+
+    def sync(self, force: bool = False, max_workers: int = 1) -> List[Dict]:
+        """
+        Fetch all playlists, their videos and stale videos within the quota budget.
+
+        Work is ordered by schedule_playlists, and stored videos older than
+        video_max_age are refreshed with whatever budget is left. When the
+        budget runs out the sync stops cleanly: everything fetched so far is
+        stored, and playlists left unsynced are picked up by the next run.
+
+        Args:
+            force: Re-fetch playlists even if they were found unchanged
+            max_workers: Maximum number of playlists fetched at the same time
+
+        Returns:
+            List of playlist data dictionaries
+        """
+        playlists = []
+        try:
+            playlists = self.get_all_playlists()
+            playlist_ids = self.schedule_playlists(playlists, force)
+            if self.batch:
+                self.sync_playlists_batched(playlist_ids)
+            elif max_workers > 1:
+                self.sync_playlists_concurrently(playlist_ids, max_workers=max_workers, force=True)
+            else:
+                for playlist_id in playlist_ids:
+                    self.get_playlist_videos(playlist_id, force=True)
+            self.refresh_stale_videos()
+        except QuotaExceededError as e:
+            print(f"Stopping sync: {e}")
+        finally:
+            self._finish_sync()
+        return playlists
+
+    def schedule_playlists(self, playlists: List[Dict], force: bool = False) -> List[str]:
+        """
+        Order playlists for syncing within the remaining quota budget.
+
+        Playlists new since the last run come first, then changed ones, each
+        smallest first so as many playlists as possible are completed.
+        Unchanged playlists are left out unless force is set, and playlists
+        whose estimated cost exceeds what is left of the budget are deferred.
+
+        Returns:
+            IDs of the playlists to sync, in order
+        """
+        candidates = [playlist for playlist in playlists
+                      if force or playlist['id'] not in self.unchanged_playlist_ids]
+        candidates.sort(key=lambda playlist: (playlist['id'] not in self.new_playlist_ids,
+                                              playlist['itemCount'] or 0))
+
+        budget = self.quota.remaining
+        playlist_ids = []
+        for playlist in candidates:
+            cost = self._estimate_playlist_cost(playlist)
+            if cost > budget:
+                print(f"Deferring playlist {playlist['title']}: needs about {cost} quota units, {budget} left")
+                continue
+            budget -= cost
+            playlist_ids.append(playlist['id'])
+        return playlist_ids
+
+    def _estimate_playlist_cost(self, playlist: Dict) -> int:
+        """Estimate the quota units syncing a playlist costs: a listing and a videos request per page."""
+        pages = max(1, math.ceil((playlist['itemCount'] or 0) / 50))
+        return pages * (self.quota.cost('youtube.playlistItems.list') + self.quota.cost('youtube.videos.list'))
+
+    def _finish_sync(self):
+        """Record quota charges and make sure unsynced playlists count as changed next run."""
+        if self.pending_playlist_ids:
+            # Also re-list playlists next run, so the cleared etags are replaced
+            with self.db.transaction():
+                self.db.clear_playlist_etags(sorted(self.pending_playlist_ids))
+                self.db.delete_page_etags(PLAYLISTS_KEY_PREFIX)
+        self.quota.flush()
 
     def get_all_playlists(self) -> List[Dict]:
-        """Get all playlists from the authenticated user's account and store in database."""
+        """
+        Get all playlists from the authenticated user's account and store in database.
+
+        Pages are requested with the etag stored from the previous run, so
+        unchanged pages come back as 304 and are served from the database.
+        Playlists whose etag and itemCount are unchanged and whose items are
+        fully stored are recorded in unchanged_playlist_ids.
+        """
         playlists = []
         next_page_token = None
 
         while True:
             request = self.youtube.playlists().list(
-                part="snippet,contentDetails",
+                part=PLAYLISTS_PART,
+                fields=PLAYLISTS_FIELDS,
                 mine=True,
                 maxResults=50,
                 pageToken=next_page_token
             )
-            response = request.execute()
-
-            for item in response['items']:
-                playlist_data = {
-                    'etag': item['etag'],
-                    'id': item['id'],
-                    'publishedAt': datetime.fromisoformat(item['snippet']['publishedAt'].replace('Z', '+00:00')),
-                    'channelId': item['snippet']['channelId'],
-                    'title': item['snippet']['title'],
-                    'description': item['snippet']['description'],
-                    'itemCount': item['contentDetails']['itemCount']
-                }
-                self.db.insert_playlist(playlist_data)
-                playlists.append(playlist_data)
+            request_key = PLAYLISTS_KEY_PREFIX + (next_page_token or '')
+            cached_page = self.db.get_page_etag(request_key)
+            response = self._execute_conditional(request, cached_page)
+
+            if response is None:
+                # Page not modified since the last run
+                playlists.extend(self._load_playlists_page(cached_page))
+                next_page_token = cached_page['nextPageToken']
+                if not next_page_token:
+                    break
+                continue
+
+            playlists.extend(self._store_playlists_page(request_key, response))
 
             next_page_token = response.get('nextPageToken')
             if not next_page_token:
@@ -79,86 +357,634 @@ class YouTubePlaylistCollector:
 
         return playlists
 
-    def get_playlist_videos(self, playlist_id: str) -> List[Dict]:
-        """Get all videos from a specific playlist and store in database."""
+    def _store_playlists_page(self, request_key: str, response: Dict) -> List[Dict]:
+        """Store a modified playlists page and its etag in one commit."""
+        page_playlists = [parse_playlist(item) for item in response['items']]
+
+        # Compare against what was stored before this page overwrites it
+        self._mark_unchanged_playlists(
+            page_playlists,
+            self.db.get_playlist_sync_state([playlist['id'] for playlist in page_playlists])
+        )
+
+        with self.db.transaction():
+            self.db.insert_playlists(page_playlists)
+            self.quota.flush()
+            self.db.set_page_etag(
+                request_key,
+                response['etag'],
+                response.get('nextPageToken'),
+                [playlist['id'] for playlist in page_playlists]
+            )
+        return page_playlists
+
+    def _load_playlists_page(self, cached_page: Dict) -> List[Dict]:
+        """Load the playlists of a page that was not modified since the last run."""
+        page_playlists = self.db.get_playlists_by_id(cached_page['itemIds'])
+        self._mark_unchanged_playlists(page_playlists, self.db.get_playlist_sync_state(cached_page['itemIds']))
+        return page_playlists
+
+    def get_playlist_videos(self, playlist_id: str, force: bool = False) -> List[Dict]:
+        """
+        Get all videos from a specific playlist and store in database.
+
+        Playlists found unchanged by get_all_playlists are skipped unless force
+        is set, and pages whose stored etag still matches are not re-parsed.
+        Only videos fetched during this call are returned.
+        """
         videos = []
+
+        if not force and playlist_id in self.unchanged_playlist_ids:
+            return videos
+
+        self._load_resolved_video_ids()
+        cached_pages = self.db.get_page_etags(self._playlist_items_key(playlist_id, ''))
+        for page in self._fetch_playlist_pages(self.youtube, playlist_id, cached_pages):
+            self._store_playlist_page(page)
+            videos.extend(page['videos'])
+        self.pending_playlist_ids.discard(playlist_id)
+
+        return videos
+
+    def sync_playlists_concurrently(self, playlist_ids: List[str], max_workers: int = 4,
+                                    force: bool = False) -> List[Dict]:
+        """
+        Fetch several playlists in parallel and store them in the database.
+
+        Each worker thread builds its own API service, since httplib2 is not
+        thread-safe; with a pooled transport the services share connections.
+        Workers only talk to the API; all database writes happen on the
+        calling thread as each playlist completes. If a playlist fails, e.g.
+        because the quota budget runs out, playlists not started yet are
+        cancelled, and the pages fetched until then are still stored before
+        the first error is raised.
+
+        Args:
+            playlist_ids: IDs of the playlists to sync
+            max_workers: Maximum number of playlists fetched at the same time
+            force: Re-fetch playlists even if they were found unchanged
+
+        Returns:
+            List of video data dictionaries fetched during this call
+        """
+        videos = []
+        if not force:
+            playlist_ids = [playlist_id for playlist_id in playlist_ids
+                            if playlist_id not in self.unchanged_playlist_ids]
+
+        # Read the stored state up front so workers never touch the database
+        self._load_resolved_video_ids()
+        cached_pages = {
+            playlist_id: self.db.get_page_etags(self._playlist_items_key(playlist_id, ''))
+            for playlist_id in playlist_ids
+        }
+        local = threading.local()
+
+        errors = []
+
+        def fetch(playlist_id: str) -> Tuple[str, List[Dict], bool]:
+            if not hasattr(local, 'youtube'):
+                local.youtube = self.build_service()
+            pages = []
+            try:
+                for page in self._fetch_playlist_pages(local.youtube, playlist_id, cached_pages[playlist_id]):
+                    pages.append(page)
+            except Exception as e:
+                errors.append(e)
+                return playlist_id, pages, False
+            return playlist_id, pages, True
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(fetch, playlist_id) for playlist_id in playlist_ids]
+            for future in as_completed(futures):
+                if future.cancelled():
+                    continue
+                playlist_id, pages, complete = future.result()
+                for page in pages:
+                    self._store_playlist_page(page)
+                    videos.extend(page['videos'])
+                if complete:
+                    self.pending_playlist_ids.discard(playlist_id)
+                elif errors:
+                    # Playlists already being fetched finish and are stored;
+                    # queued ones are not started
+                    for pending in futures:
+                        pending.cancel()
+
+        if errors:
+            raise errors[0]
+        return videos
+
+    def sync_playlists_batched(self, playlist_ids: List[str]) -> List[Dict]:
+        """
+        Fetch several playlists with batch requests and store them in the database.
+
+        Playlists are paged through in lockstep: each round requests the next
+        page of every unfinished playlist, then the videos on those pages,
+        with the calls grouped into batch requests. Each round is stored in
+        one commit. If a round fails, the videos it fetched and the pages
+        whose videos were all fetched are still stored before the error is
+        raised; a playlist that fails for good does not stop the videos of
+        the other pages in its round from being fetched first.
+
+        Args:
+            playlist_ids: IDs of the playlists to sync
+
+        Returns:
+            List of video data dictionaries fetched during this call
+        """
+        self._load_resolved_video_ids()
+        cached_pages = {
+            playlist_id: self.db.get_page_etags(self._playlist_items_key(playlist_id, ''))
+            for playlist_id in playlist_ids
+        }
+        page_tokens = {playlist_id: None for playlist_id in playlist_ids}
+        videos = []
+
+        while page_tokens:
+            requests = []
+            for playlist_id, page_token in page_tokens.items():
+                request = self.youtube.playlistItems().list(
+                    part=PLAYLIST_ITEMS_PART,
+                    fields=PLAYLIST_ITEMS_FIELDS,
+                    playlistId=playlist_id,
+                    maxResults=50,
+                    pageToken=page_token
+                )
+                cached_page = cached_pages[playlist_id].get(self._playlist_items_key(playlist_id, page_token))
+                if cached_page:
+                    request.headers['If-None-Match'] = cached_page['etag']
+                requests.append((playlist_id, request))
+
+            next_page_tokens = {}
+            pages = []
+            claimed_video_ids = []
+            fetched_video_ids = set()
+
+            def collect_page(playlist_id: str, response: Optional[Dict]):
+                request_key = self._playlist_items_key(playlist_id, page_tokens[playlist_id])
+                if response is None:
+                    # Page not modified since the last run
+                    next_page_token = cached_pages[playlist_id][request_key]['nextPageToken']
+                else:
+                    next_page_token = response.get('nextPageToken')
+                    pages.append({
+                        'request_key': request_key,
+                        'etag': response['etag'],
+                        'nextPageToken': next_page_token,
+                        'items': [parse_playlist_item(item, playlist_id) for item in response['items']]
+                    })
+                if next_page_token:
+                    next_page_tokens[playlist_id] = next_page_token
+
+            def store_videos(video_ids: List[str], chunk_videos: List[Dict]):
+                self.db.insert_videos(chunk_videos)
+                videos.extend(chunk_videos)
+                fetched_video_ids.update(video_ids)
+
+            error = None
+            with self.db.transaction():
+                try:
+                    try:
+                        self._execute_batch(requests, collect_page)
+                    except HttpError as e:
+                        # A call that failed for good, e.g. for a deleted
+                        # playlist, still lets the other pages be completed
+                        if classify_api_error(e) is not None:
+                            raise
+                        error = e
+                    claimed_video_ids = self._claim_video_ids(
+                        [item['videoId'] for page in pages for item in page['items']])
+                    self._fetch_videos_batched(claimed_video_ids, store_videos)
+                except Exception as e:
+                    # Keep what was already fetched and paid for
+                    error = error or e
+
+                # A page etag is only stored once all of the page's videos
+                # are, so an incomplete page is fetched again next run
+                unfetched_video_ids = set(claimed_video_ids) - fetched_video_ids
+                for page in pages:
+                    if all(item['videoId'] in self.resolved_video_ids
+                           and item['videoId'] not in unfetched_video_ids for item in page['items']):
+                        self.db.insert_playlist_items(page['items'])
+                        self.db.set_page_etag(page['request_key'], page['etag'], page['nextPageToken'],
+                                              [item['id'] for item in page['items']])
+                self.quota.flush()
+            if error:
+                raise error
+
+            self.pending_playlist_ids.difference_update(page_tokens.keys() - next_page_tokens.keys())
+            page_tokens = next_page_tokens
+
+        return videos
+
+    def _execute_batch(self, requests: List[Tuple[str, object]],
+                       callback: Callable[[str, Optional[Dict]], None]):
+        """
+        Send independent requests grouped into batch requests of BATCH_SIZE calls.
+
+        Every call is charged against the quota budget each time it is sent.
+        Calls that fail transiently, on their own or because the whole batch
+        request did, are sent again in a later batch after a backoff delay.
+        Calls that fail permanently are not retried; the other calls are
+        completed before the first such error is raised. Each batch request
+        is one outcome for the shared circuit breaker.
+
+        Args:
+            requests: Pairs of a unique request ID and an HttpRequest;
+                conditional requests must already carry If-None-Match
+            callback: Called as callback(request_id, response) for each call
+                that succeeds, with None as the response for 304 Not Modified
+
+        Raises:
+            QuotaExceededError: If the budget runs out; calls charged before
+                that are still sent and passed to callback first
+            HttpError: For the first permanent error, or once retries are used up
+        """
+        pending = list(requests)
+        attempt = 0
+        errors = []
+        quota_error = None
+
+        while pending:
+            retry_later = []
+            retry_after = 0.0
+            transient_error = None
+
+            for start in range(0, len(pending), BATCH_SIZE):
+                time.sleep(self.retrier.breaker.pause_remaining())
+                outcomes = {}
+
+                def record(request_id: str, response: Optional[Dict], exception: Optional[Exception]):
+                    outcomes[request_id] = (response, exception)
+
+                batch = BatchHttpRequest(callback=record, batch_uri=BATCH_URI)
+                chunk = []
+                for request_id, request in pending[start:start + BATCH_SIZE]:
+                    try:
+                        self.quota.charge(request.methodId)
+                    except QuotaExceededError as e:
+                        quota_error = e
+                        break
+                    batch.add(request, request_id=request_id)
+                    chunk.append((request_id, request))
+                if not chunk:
+                    break
+
+                try:
+                    batch.execute()
+                except Exception as e:
+                    if classify_api_error(e) is None:
+                        raise
+                    # The batch request itself failed; every call in it is retried
+                    outcomes = {request_id: (None, e) for request_id, _ in chunk}
+
+                failed = False
+                for request_id, request in chunk:
+                    response, exception = outcomes[request_id]
+                    if exception is None:
+                        callback(request_id, response)
+                        continue
+                    if (isinstance(exception, HttpError) and exception.resp.status == 304
+                            and 'If-None-Match' in request.headers):
+                        callback(request_id, None)
+                        continue
+                    delay = classify_api_error(exception)
+                    if delay is None:
+                        errors.append(exception)
+                        continue
+                    failed = True
+                    retry_later.append((request_id, request))
+                    retry_after = max(retry_after, delay)
+                    transient_error = exception
+                self.retrier.breaker.record(failed)
+
+                if quota_error:
+                    break
+
+            if quota_error:
+                break
+            if retry_later:
+                if attempt >= self.retrier.max_retries:
+                    raise transient_error
+                delay = self.retrier.backoff_delay(attempt, retry_after)
+                print(f"{len(retry_later)} batched requests failed ({transient_error}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+                attempt += 1
+            pending = retry_later
+
+        if errors:
+            raise errors[0]
+        if quota_error:
+            raise quota_error
+
+    def _fetch_playlist_pages(self, youtube, playlist_id: str, cached_pages: Dict[str, Dict]):
+        """
+        Fetch the changed pages of a playlist without touching the database.
+
+        Args:
+            youtube: API service to issue requests with
+            playlist_id: ID of the playlist to fetch
+            cached_pages: Stored page etags keyed by request key
+
+        Yields:
+            Dictionary per modified page with its request key, etag, next page
+            token, playlist items and videos
+        """
         next_page_token = None
 
         while True:
-            request = self.youtube.playlistItems().list(
-                part="snippet,contentDetails",
+            request = youtube.playlistItems().list(
+                part=PLAYLIST_ITEMS_PART,
+                fields=PLAYLIST_ITEMS_FIELDS,
                 playlistId=playlist_id,
                 maxResults=50,
                 pageToken=next_page_token
             )
-            response = request.execute()
-
-            for item in response['items']:
-                # Store playlist item
-                playlist_item_data = {
-                    'etag': item['etag'],
-                    'id': item['id'],
-                    'playlistId': playlist_id,
-                    'videoId': item['contentDetails']['videoId'],
-                    'position': item['snippet']['position']
-                }
-                self.db.insert_playlist_item(playlist_item_data)
-
-                # Get and store video details
-                video_request = self.youtube.videos().list(
-                    part="snippet",
-                    id=item['contentDetails']['videoId']
-                )
-                video_response = video_request.execute()
-                
-                if video_response['items']:
-                    video_item = video_response['items'][0]
-                    video_data = {
-                        'etag': video_item['etag'],
-                        'id': video_item['id'],
-                        'title': video_item['snippet']['title'],
-                        'description': video_item['snippet']['description'],
-                        'publishedAt': datetime.fromisoformat(video_item['snippet']['publishedAt'].replace('Z', '+00:00')),
-                        'channelId': video_item['snippet']['channelId'],
-                        'channelTitle': video_item['snippet']['channelTitle']
-                    }
-                    self.db.insert_video(video_data)
-                    videos.append(video_data)
+            request_key = self._playlist_items_key(playlist_id, next_page_token)
+            cached_page = cached_pages.get(request_key)
+            response = self._execute_conditional(request, cached_page)
+
+            if response is None:
+                # Page not modified since the last run
+                next_page_token = cached_page['nextPageToken']
+                if not next_page_token:
+                    break
+                continue
+
+            playlist_items = [parse_playlist_item(item, playlist_id) for item in response['items']]
+
+            yield {
+                'request_key': request_key,
+                'etag': response['etag'],
+                'nextPageToken': response.get('nextPageToken'),
+                'items': playlist_items,
+                # Get video details for the whole page at once, skipping
+                # videos already resolved by this or an earlier playlist
+                'videos': self._fetch_videos(
+                    youtube, self._claim_video_ids([item['videoId'] for item in playlist_items]))
+            }
 
             next_page_token = response.get('nextPageToken')
             if not next_page_token:
                 break
 
+    def _store_playlist_page(self, page: Dict):
+        """Store a fetched page's playlist items, videos and etag in one commit."""
+        with self.db.transaction():
+            self.db.insert_playlist_items(page['items'])
+            self.db.insert_videos(page['videos'])
+            self.quota.flush()
+            self.db.set_page_etag(
+                page['request_key'],
+                page['etag'],
+                page['nextPageToken'],
+                [item['id'] for item in page['items']]
+            )
+
+    @staticmethod
+    def _playlist_items_key(playlist_id: str, page_token: Optional[str]) -> str:
+        """Build the page_etag request key for a playlistItems page."""
+        return f"playlistItems:{playlist_id}:{page_token or ''}"
+
+    def _execute_conditional(self, request, cached_page: Optional[Dict]) -> Optional[Dict]:
+        """
+        Execute a request with If-None-Match set from a stored page etag.
+
+        Returns:
+            The response, or None if the server answered 304 Not Modified
+        """
+        if cached_page:
+            request.headers['If-None-Match'] = cached_page['etag']
+        try:
+            return self.execute_request(request)
+        except HttpError as e:
+            if cached_page and e.resp.status == 304:
+                return None
+            raise
+
+    def execute_request(self, request) -> Dict:
+        """
+        Execute a request, retrying transient failures with the shared retrier.
+
+        Each attempt is charged against the quota budget before it is sent.
+
+        Raises:
+            QuotaExceededError: If an attempt would exceed the budget; it is
+                not sent
+            HttpError: For permanent errors, or once retries are used up
+        """
+        def attempt() -> Dict:
+            self.quota.charge(request.methodId)
+            return request.execute()
+
+        return self.retrier.call(attempt, classify_api_error)
+
+    def _mark_unchanged_playlists(self, playlists: List[Dict], stored_state: Dict[str, Dict]):
+        """
+        Record playlists whose etag and itemCount match fully stored data.
+
+        Every other playlist is recorded as pending, and as new if it was not
+        stored before. A cleared etag marks a playlist left unsynced by an
+        earlier run, so it never counts as unchanged.
+        """
+        for playlist in playlists:
+            state = stored_state.get(playlist['id'])
+            if (state
+                    and state['etag']
+                    and state['etag'] == playlist['etag']
+                    and state['itemCount'] == playlist['itemCount']
+                    and state['storedItemCount'] >= playlist['itemCount']):
+                self.unchanged_playlist_ids.add(playlist['id'])
+                self.pending_playlist_ids.discard(playlist['id'])
+            else:
+                self.unchanged_playlist_ids.discard(playlist['id'])
+                self.pending_playlist_ids.add(playlist['id'])
+                if not state:
+                    self.new_playlist_ids.add(playlist['id'])
+
+    def _load_resolved_video_ids(self):
+        """Seed the run's resolved videos with those fetched within video_max_age."""
+        if self.resolved_video_ids is None:
+            self.resolved_video_ids = self.db.get_recently_fetched_video_ids(
+                datetime.now() - self.video_max_age)
+
+    def _claim_video_ids(self, video_ids: List[str]) -> List[str]:
+        """
+        Return the video IDs not yet resolved during this run and mark them resolved.
+
+        Safe to call from worker threads, so a video shared by playlists that
+        are fetched concurrently is still requested only once.
+        """
+        with self._video_lock:
+            claimed = [video_id for video_id in dict.fromkeys(video_ids)
+                       if video_id not in self.resolved_video_ids]
+            self.resolved_video_ids.update(claimed)
+        return claimed
+
+    def refresh_stale_videos(self) -> List[Dict]:
+        """
+        Re-fetch stored videos not fetched within video_max_age, oldest first.
+
+        Only as many videos as the remaining quota budget covers are requested.
+
+        Returns:
+            List of video data dictionaries fetched during this call
+        """
+        videos = []
+        video_ids = self._claim_stale_video_ids()
+        if self.batch:
+            def store_videos(chunk_ids: List[str], chunk_videos: List[Dict]):
+                self.db.insert_videos(chunk_videos)
+                videos.extend(chunk_videos)
+
+            # Commit after every BATCH_SIZE videos requests, keeping the
+            # videos fetched before an error
+            group_size = BATCH_SIZE * MAX_VIDEO_IDS_PER_REQUEST
+            for start in range(0, len(video_ids), group_size):
+                error = None
+                with self.db.transaction():
+                    try:
+                        self._fetch_videos_batched(video_ids[start:start + group_size], store_videos)
+                    except Exception as e:
+                        error = e
+                    self.quota.flush()
+                if error:
+                    raise error
+            return videos
+
+        for start in range(0, len(video_ids), MAX_VIDEO_IDS_PER_REQUEST):
+            chunk_videos = self._fetch_videos(self.youtube, video_ids[start:start + MAX_VIDEO_IDS_PER_REQUEST])
+            self._store_videos(chunk_videos)
+            videos.extend(chunk_videos)
+        return videos
+
+    def _claim_stale_video_ids(self) -> List[str]:
+        """Claim the stale videos the remaining quota budget can refresh."""
+        self._load_resolved_video_ids()
+        requests = self.quota.remaining // self.quota.cost('youtube.videos.list')
+        if requests <= 0:
+            return []
+        return self._claim_video_ids(self.db.get_stale_video_ids(
+            datetime.now() - self.video_max_age, requests * MAX_VIDEO_IDS_PER_REQUEST))
+
+    def _store_videos(self, videos: List[Dict]):
+        """Store fetched videos and the quota spent on them in one commit."""
+        with self.db.transaction():
+            self.db.insert_videos(videos)
+            self.quota.flush()
+
+    def get_videos(self, video_ids: List[str]) -> List[Dict]:
+        """Get video details for a list of video IDs, up to 50 IDs per request."""
+        return self._fetch_videos(self.youtube, video_ids)
+
+    def _fetch_videos(self, youtube, video_ids: List[str]) -> List[Dict]:
+        """Get video details using the given API service."""
+        videos = []
+        # Playlists can contain the same video more than once
+        video_ids = list(dict.fromkeys(video_ids))
+
+        for start in range(0, len(video_ids), MAX_VIDEO_IDS_PER_REQUEST):
+            chunk = video_ids[start:start + MAX_VIDEO_IDS_PER_REQUEST]
+            video_response = self.execute_request(self._videos_request(youtube, chunk))
+
+            videos.extend(parse_video(video_item) for video_item in video_response['items'])
+
         return videos
 
+    def _fetch_videos_batched(self, video_ids: List[str], callback: Callable[[List[str], List[Dict]], None]):
+        """
+        Get video details with batch requests, passing each response on as it arrives.
+
+        Args:
+            video_ids: IDs of the videos to fetch
+            callback: Called as callback(requested_ids, videos) for each
+                videos request that succeeds; requested IDs missing from
+                videos were not found on YouTube
+        """
+        chunks = {
+            str(start): video_ids[start:start + MAX_VIDEO_IDS_PER_REQUEST]
+            for start in range(0, len(video_ids), MAX_VIDEO_IDS_PER_REQUEST)
+        }
+        self._execute_batch(
+            [(request_id, self._videos_request(self.youtube, chunk)) for request_id, chunk in chunks.items()],
+            lambda request_id, response: callback(
+                chunks[request_id], [parse_video(video_item) for video_item in response['items']])
+        )
+
+    @staticmethod
+    def _videos_request(youtube, video_ids: List[str]):
+        """Build a videos request for up to MAX_VIDEO_IDS_PER_REQUEST IDs."""
+        return youtube.videos().list(
+            part=VIDEOS_PART,
+            fields=VIDEOS_FIELDS,
+            id=','.join(video_ids)
+        )
+
     def print_playlist_data(self):
         """Print all playlists and their videos from the database."""
-        playlists = self.db.get_all_playlists()
-        
-        print(f"\nFound {len(playlists)} playlists:")
+        print(f"\nFound {self.db.count_playlists()} playlists:")
         print("-" * 50)
 
-        for playlist in playlists:
-            print(f"\nPlaylist: {playlist['title']}")
-            print(f"Description: {playlist['description']}")
-            print(f"Total videos: {playlist['itemCount']}")
-            print("-" * 30)
-
-            playlist_items = self.db.get_playlist_items(playlist['id'])
-            for item in playlist_items:
-                video = self.db.get_video(item['videoId'])
-                if video:
-                    print(f"Position {item['position']}: {video['title']}")
-                    print(f"Video ID: {video['id']}")
-                    print(f"Channel: {video['channelTitle']}")
-                    print("-" * 20)
+        current_playlist_id = None
+        for row in self.db.iter_playlist_report():
+            if row['playlistId'] != current_playlist_id:
+                current_playlist_id = row['playlistId']
+                print(f"\nPlaylist: {row['playlistTitle']}")
+                print(f"Description: {row['playlistDescription']}")
+                print(f"Total videos: {row['itemCount']}")
+                print("-" * 30)
+
+            if row['videoId']:
+                print(f"Position {row['position']}: {row['videoTitle']}")
+                print(f"Video ID: {row['videoId']}")
+                print(f"Channel: {row['channelTitle']}")
+                print("-" * 20)
 
 def main():
-    collector = YouTubePlaylistCollector()
-    playlists = collector.get_all_playlists()
-    for playlist in playlists:
-        collector.get_playlist_videos(playlist['id'])
+    parser = argparse.ArgumentParser(description="Collect YouTube playlist data into the local database.")
+    parser.add_argument('--workers', type=int,
+                        help="number of playlists to fetch in parallel "
+                             "(default: 1, serial, for the sync engine and 8 for the async engine)")
+    parser.add_argument('--engine', choices=['sync', 'async'], default='sync',
+                        help="fetch engine to use (default: sync)")
+    parser.add_argument('--video-max-age', type=float, default=VIDEO_MAX_AGE.total_seconds() / 3600,
+                        help="hours before a stored video is requested again (default: %(default)g); "
+                             "with 0 each video is still requested only once per run")
+    parser.add_argument('--quota-budget', type=int, default=DEFAULT_DAILY_BUDGET,
+                        help="API quota units to spend per day, counting earlier runs (default: %(default)s)")
+    parser.add_argument('--transport', choices=TRANSPORTS, default=DEFAULT_TRANSPORT,
+                        help="HTTP transport of the sync engine: pooled and http2 share keep-alive "
+                             "connections between workers (default: %(default)s)")
+    parser.add_argument('--pool-size', type=int,
+                        help=f"connections to keep alive (default: the larger of --workers and {DEFAULT_POOL_SIZE})")
+    parser.add_argument('--timeout', type=float, default=DEFAULT_TIMEOUT,
+                        help="seconds to wait to connect or for data (default: %(default)g)")
+    parser.add_argument('--batch', action='store_true',
+                        help="group the sync engine's requests into batch requests of up to "
+                             f"{BATCH_SIZE} calls; replaces --workers")
+    args = parser.parse_args()
+    video_max_age = timedelta(hours=args.video_max_age)
+
+    if args.engine == 'async':
+        from async_playlist_collector import AsyncYouTubePlaylistCollector, DEFAULT_MAX_CONCURRENCY
+        workers = args.workers or DEFAULT_MAX_CONCURRENCY
+        collector = AsyncYouTubePlaylistCollector(max_concurrency=workers, video_max_age=video_max_age,
+                                                  quota_budget=args.quota_budget,
+                                                  pool_size=args.pool_size or max(workers, DEFAULT_POOL_SIZE),
+                                                  timeout=args.timeout)
+    else:
+        workers = args.workers or 1
+        collector = YouTubePlaylistCollector(video_max_age=video_max_age, quota_budget=args.quota_budget,
+                                             transport=args.transport,
+                                             pool_size=args.pool_size or max(workers, DEFAULT_POOL_SIZE),
+                                             timeout=args.timeout, batch=args.batch)
+    collector.sync(max_workers=workers)
     collector.print_playlist_data()
+    print(f"\nQuota used today: {collector.quota.used} of {collector.quota.daily_budget} units")
+    if collector.http:
+        collector.http.close()
+    collector.db.close()
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file